@@ -0,0 +1,151 @@
+import math
+
+import numpy as np
+
+from feature_extraction import player_feature_matrix
+
+
+def _team_players(players):
+    # Team1Players/Team2Players as read from the matches CSV, "['A', 'B', ...]",
+    # with or without the brackets, or already a list.
+    if isinstance(players, str):
+        return [player.strip().strip("'\"") for player in players.strip().strip('[]').split(', ')]
+    return list(players)
+
+
+def _best_players(best_11):
+    if isinstance(best_11, str):
+        return [player.strip() for player in best_11.split(',')]
+    return list(best_11)
+
+
+class MatchCandidates:
+    # Every training match's candidates (both squads, first team first) as one
+    # zero-padded (match, candidate, feature) tensor, with a mask for the real
+    # candidates and a 1 label for the ones in the match's best XI. Built once,
+    # so training epochs are matrix operations only.
+
+    def __init__(self, match_ids, players, X, y, mask):
+        self.match_ids = match_ids
+        self.players = players
+        self.X = X
+        self.y = y
+        self.mask = mask
+
+    @classmethod
+    def from_matches(cls, best_11_teams_df, matches_df, features_df):
+        # best_11_teams_df holds ID and Best11Team; matches without squads in
+        # matches_df are skipped, as the notebook's training loop skips them.
+        squads = matches_df.drop_duplicates('ID').set_index('ID')[['Team1Players', 'Team2Players']]
+        match_ids, candidates, labels = [], [], []
+        for match_id, best_11 in zip(best_11_teams_df['ID'], best_11_teams_df['Best11Team']):
+            if match_id not in squads.index:
+                continue
+            team1_players, team2_players = squads.loc[match_id]
+            if not isinstance(team1_players, (str, list)) or not isinstance(team2_players, (str, list)):
+                continue
+            all_players = _team_players(team1_players) + _team_players(team2_players)
+            best_11 = set(_best_players(best_11))
+            match_ids.append(match_id)
+            candidates.append(all_players)
+            labels.append([player in best_11 for player in all_players])
+
+        counts = np.array([len(players) for players in candidates], dtype=np.int64)
+        width = int(counts.max()) if len(counts) else 0
+        mask = np.arange(width) < counts[:, None]
+        players = np.full((len(candidates), width), '', dtype=object)
+        players[mask] = [player for match_players in candidates for player in match_players]
+        # One feature lookup for every candidate of every match; players without
+        # features get zeros, as extract_features gives them.
+        X = np.zeros((len(candidates), width, features_df.shape[1]))
+        X[mask] = player_feature_matrix(features_df, players[mask].tolist())
+        y = np.zeros((len(candidates), width))
+        y[mask] = [label for match_labels in labels for label in match_labels]
+        return cls(np.array(match_ids), players, X, y, mask)
+
+    def __len__(self):
+        return len(self.match_ids)
+
+    def subset(self, rows):
+        return MatchCandidates(self.match_ids[rows], self.players[rows], self.X[rows], self.y[rows], self.mask[rows])
+
+    def split(self, test_size):
+        # Ordered split, the last matches held out.
+        n_test = math.ceil(test_size * len(self))
+        return self.subset(slice(0, len(self) - n_test)), self.subset(slice(len(self) - n_test, len(self)))
+
+
+def weights_initial(num_features, seed=42):
+    # The notebook's initialisation: np.random.seed(42), then uniform(-0.5, 0.5)
+    # draws for the weights and the bias.
+    random_state = np.random.RandomState(seed)
+    weights = random_state.uniform(low=-0.5, high=0.5, size=num_features)
+    bias = random_state.uniform(low=-0.5, high=0.5)
+    return weights, bias
+
+
+def _logits(X, weights, bias):
+    return X @ weights + bias
+
+
+def candidate_probabilities(candidates, weights, bias):
+    # Probability of every candidate being in the best XI, 0 for padding.
+    z = _logits(candidates.X, weights, bias)
+    return np.where(candidates.mask, np.exp(-np.logaddexp(0.0, -z)), 0.0)
+
+
+def match_loss(candidates, weights, bias, l2=0.0):
+    # The notebook's loss: binary cross-entropy averaged over each match's
+    # candidates, then over matches.
+    z = _logits(candidates.X, weights, bias)
+    losses = np.where(candidates.mask, np.logaddexp(0.0, z) - candidates.y * z, 0.0)
+    loss = np.mean(losses.sum(axis=1) / candidates.mask.sum(axis=1))
+    return loss + 0.5 * l2 * np.dot(weights, weights)
+
+
+def _gradients(candidates, weights, bias, l2):
+    z = _logits(candidates.X, weights, bias)
+    # Each match's residuals count 1/candidates, so every match weighs the same.
+    residuals = np.where(candidates.mask, np.exp(-np.logaddexp(0.0, -z)) - candidates.y, 0.0)
+    residuals /= candidates.mask.sum(axis=1)[:, None] * len(candidates)
+    dw = np.einsum('mcf,mc->f', candidates.X, residuals) + l2 * weights
+    db = residuals.sum()
+    return dw, db
+
+
+def train_best_xi_classifier(candidates, learning_rate=0.01, num_iterations=1000, batch_size=None, l2=0.0,
+                             validation=None, patience=None, min_delta=0.0, shuffle=True, seed=42):
+    # Gradient descent on the notebook's logistic regression. batch_size=None
+    # takes one full-batch step per epoch; batch_size=1 with shuffle=False makes
+    # the notebook's one step per match, in order. With patience set, training
+    # stops once the validation loss (the training loss without validation) has
+    # not improved by min_delta for that many epochs, keeping the best weights.
+    weights, bias = weights_initial(candidates.X.shape[2], seed)
+    rng = np.random.default_rng(seed)
+    batch_size = batch_size or len(candidates)
+    monitored = validation if validation is not None else candidates
+    best = (np.inf, weights.copy(), bias)
+    waited = 0
+    history = []
+    for iteration in range(num_iterations):
+        order = rng.permutation(len(candidates)) if shuffle else np.arange(len(candidates))
+        for start in range(0, len(candidates), batch_size):
+            batch = candidates.subset(order[start:start + batch_size]) if batch_size < len(candidates) else candidates
+            dw, db = _gradients(batch, weights, bias, l2)
+            weights = weights - learning_rate * dw
+            bias = bias - learning_rate * db
+
+        loss = match_loss(monitored, weights, bias, l2)
+        history.append(loss)
+        print(f"Iteration {iteration + 1}, Loss: {loss:.4f}")
+        if loss < best[0] - min_delta:
+            best = (loss, weights.copy(), bias)
+            waited = 0
+        else:
+            waited += 1
+            if patience is not None and waited >= patience:
+                print(f"Stopping early after {iteration + 1} iterations.")
+                break
+    if patience is not None:
+        weights, bias = best[1], best[2]
+    return weights, bias, history
@@ -1,35 +1,7 @@
 import os
 import pandas as pd
-import numpy as np
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.model_selection import train_test_split
-from keras.models import Sequential
-from keras.layers import LSTM, Dense
-from keras.callbacks import EarlyStopping, ReduceLROnPlateau
-import matplotlib.pyplot as plt
-import csv
-def read_player_roles(file_path):
-    player_roles = {}
-    with open(file_path, 'r') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            player_roles[row['name']] = row['role']
-    return player_roles
-def load_and_preprocess_data(directory, players_list, game_id):
-    all_data = pd.DataFrame()
-    for filename in os.listdir(directory):
-        player_name = filename[:-4]          if player_name in players_list:
-            df = pd.read_csv(os.path.join(directory, filename))
-            df['date'] = pd.to_datetime(df['date'], format='%d/%m/%y')              df['Player'] = player_name
-            df['match_id'] = game_id              all_data = pd.concat([all_data, df], ignore_index=True)
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    all_data['fantasy_score'] = all_data.groupby('Player')['fantasy_score'].transform(
-        lambda x: scaler.fit_transform(x.values.reshape(-1, 1)).flatten()
-    )
-    window_size = 5      all_data.sort_values(['Player', 'date'], inplace=True)      all_data['avg_last_5'] = all_data.groupby('Player')['fantasy_score'].rolling(window=window_size, min_periods=1).mean().reset_index(0, drop=True)
-    all_data['max_last_5'] = all_data.groupby('Player')['fantasy_score'].rolling(window=window_size, min_periods=1).max().reset_index(0, drop=True)
-    all_data['std_last_5'] = all_data.groupby('Player')['fantasy_score'].rolling(window=window_size, min_periods=1).std().reset_index(0, drop=True)
-    return all_data
+from dataset_store import load_player_scores
+from score_inference import latest_model_artifact, load_runtime_artifact, predict_player_scores
 def get_players_from_id(df, ID):
     row = df.loc[ID]
     team1_players = row['Team1Players']
@@ -42,91 +14,48 @@ def get_players_from_id(df, ID):
         team2_players = [player.strip() for player in team2_players.split(',')]
     else:
         team2_players = list(team2_players)
-    all_players = list(set(team1_players + team2_players))      return all_players
-def prepare_player_sequences(data, sequence_length, player_name):
-    player_data = data[data['Player'] == player_name]
-    X, y = create_sequences(player_data, sequence_length)
-    if len(X.shape) >= 2:
-        X = X.reshape((X.shape[0], X.shape[1], 1))
-    else:
-        X = np.empty((0, sequence_length, 1))
-    return X
+    all_players = list(set(team1_players + team2_players))
+    return all_players
 df_teams = pd.read_csv('/Users/hemantg/Desktop/updated-matches-6may.csv')
-print(df_teams.index)
-if 'ID' not in df_teams.index:
-    df_teams.set_index('ID', inplace=True)  game_ids = input("Enter the game IDs separated by spaces: ").split()
-directory = '/Users/hemantg/Desktop/fantasy-score-data-6may'
+if 'ID' in df_teams.columns:
+    df_teams.set_index('ID', inplace=True)
+match_dates = pd.to_datetime(df_teams['Date'])
+# player_scores_path may also be a directory of older per-player CSVs.
+player_scores_path = '/Users/hemantg/Desktop/fantasy-score-data-6may/player_fantasy_scores.parquet'
+artifacts_dir = '/Users/hemantg/Desktop/player-score-models'
+all_scores = load_player_scores(player_scores_path)
+# The model is trained once on every player's history before the cutoff and
+# saved; scoring a game only runs inference on the players' last matches.
+# keras is only imported to train; saved models are scored by the NumPy runtime.
+if input("Train a new model? (y/n): ").strip().lower() == 'y':
+    from score_model import train_global_model
+    cutoff = input("Enter the training cutoff date (YYYY-MM-DD): ")
+    artifact_path, history = train_global_model(all_scores, cutoff, artifacts_dir)
+else:
+    artifact_path = input("Enter the model artifact path (blank for the latest): ").strip() or latest_model_artifact(artifacts_dir)
+    if artifact_path is None:
+        raise SystemExit(f"No saved model found in {artifacts_dir}")
+model, metadata = load_runtime_artifact(artifact_path)
+print(f"Using {metadata['model']} v{metadata['version']} trained on matches before {metadata['cutoff']}")
+game_ids = input("Enter the game IDs separated by spaces: ").split()
 output_dir = input("Enter the path to the output directory: ")
-player_roles_file = input("Enter the path to the CSV file containing player roles: ")
-cricket_players = read_player_roles(player_roles_file)
 for game_id in game_ids:
     try:
         game_id = int(game_id)
         players_list = get_players_from_id(df_teams, game_id)
-        data = load_and_preprocess_data(directory, players_list, game_id)
-        sequence_length = 18          X, y = create_sequences(data, sequence_length)
-        X_train_val, X_test, y_train_val, y_test = train_test_split(X, y, test_size=0.15, random_state=42, shuffle=False)
-        X_train, X_val, y_train, y_val = train_test_split(X_train_val, y_train_val, test_size=0.18, random_state=42, shuffle=False)          X_train = X_train.reshape((X_train.shape[0], X_train.shape[1], 1))
-        X_val = X_val.reshape((X_val.shape[0], X_val.shape[1], 1))
-        X_test = X_test.reshape((X_test.shape[0], X_test.shape[1], 1))
-        model = Sequential([
-            LSTM(50, activation='relu', input_shape=(X_train.shape[1], 1)),
-            Dense(1)
-        ])
-        model.compile(optimizer='adam', loss='mean_squared_error')
-        early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
-        history = model.fit(
-            X_train, y_train,
-            epochs=100,
-            batch_size=32,
-            validation_split=0.1,              callbacks=[early_stopping]
-        )
-        test_loss = model.evaluate(X_test, y_test)
-        print(f'Test Loss for Game ID {game_id}: {test_loss}')
-        plt.figure(figsize=(10, 5))
-        plt.plot(history.history['loss'], label='Train Loss')
-        plt.plot(history.history['val_loss'], label='Validation Loss')
-        plt.title('Model Training History')
-        plt.xlabel('Epoch')
-        plt.ylabel('Loss')
-        plt.legend()
-        plt.savefig(os.path.join(output_dir, f'{game_id} - Model Training History Graph.png'))
-        plt.close()
-        test_loss = model.evaluate(X_test, y_test)
-        print(f'Final Test Loss for Game ID {game_id}: {test_loss}')
-        predictions = model.predict(X_test)
-        plt.figure(figsize=(10, 5))
-        plt.plot(predictions, label='Predicted Fantasy Scores')
-        plt.plot(y_test, label='Actual Fantasy Scores')
-        plt.title('Comparison of Predictions and Actual Scores')
-        plt.xlabel('Test Sample')
-        plt.ylabel('Fantasy Score')
-        plt.legend()
-        plt.savefig(os.path.join(output_dir, f'{game_id} - Comparison of Predictions and Actual Scores Graph.png'))
-        plt.close()
-        scalers = {}
+        match_date = match_dates.loc[game_id]
+        if match_date < pd.Timestamp(metadata['cutoff']):
+            print(f"Warning: Game ID {game_id} was played before the model's cutoff {metadata['cutoff']}.")
+        # Only scores from before the match date feed the predictions.
+        # One model call for every player; short histories are left-padded.
+        predicted_scores = predict_player_scores(model, all_scores, players_list, metadata['scalers'],
+                                                 metadata['sequence_length'], before=match_date)
         for player in players_list:
-            player_scores = data[data['Player'] == player]['fantasy_score'].values.reshape(-1, 1)
-            if player_scores.size > 0:
-                scaler = MinMaxScaler()
-                scaler.fit(player_scores)
-                scalers[player] = scaler
+            if player in predicted_scores.index:
+                print(f"Predicted Fantasy Score for {player}: {predicted_scores[player]}")
             else:
-                print(f"No data available for player {player}. Skipping this player.")
-                continue
-        player_scores = []
-        for player in players_list:
-            try:
-                if player in scalers:
-                    player_sequence = prepare_player_sequences(data, sequence_length, player)
-                    predicted_score_normalized = model.predict(player_sequence)
-                    predicted_score = scalers[player].inverse_transform(predicted_score_normalized)
-                    player_scores.append((player, predicted_score[0][0]))
-                    print(f"Predicted Fantasy Score for {player}: {predicted_score[0][0]}")
-                else:
-                    print(f"No scaler available for {player} due to lack of data.")
-            except ValueError as e:
-                print(e)
+                print(f"No data for player {player} before {match_date.date()}. Skipping this player.")
+        player_scores = list(predicted_scores.items())
         player_scores.sort(key=lambda x: x[1], reverse=True)
         top_players = player_scores[:11]
         top_players_df = pd.DataFrame(top_players, columns=['Player', 'Fantasy Score'])
@@ -135,24 +64,3 @@ for game_id in game_ids:
         print(f"Error processing Game ID {game_id}: {e}")
     except KeyError:
         print(f"Game ID {game_id} not found in the dataset.")
-        player_roles = {}
-        for player in players_list:
-            if player in cricket_players:
-                player_roles[player] = cricket_players[player]
-            else:
-                print(f"Player {player} not found in the CSV file.")
-        top_players = []
-        for role in ['WK', 'AR', 'BAT', 'BWL']:
-            role_players = [(player, score) for player, score in player_scores if player_roles.get(player) == role]
-            if role_players:
-                top_player = max(role_players, key=lambda x: x[1])
-                top_players.append(top_player)
-        remaining_players = [player for player in player_scores if player not in top_players]
-        remaining_players.sort(key=lambda x: x[1], reverse=True)
-        top_players.extend(remaining_players[:7])
-        top_players_df = pd.DataFrame(top_players, columns=['Player', 'Fantasy Score'])
-        top_players_df.to_csv(os.path.join(output_dir, f'{game_id} - Top 11 Players.csv'), index=False)
-    except ValueError as e:
-        print(f"Error processing Game ID {game_id}: {e}")
-    except KeyError:
-        print(f"Game ID {game_id} not found in the dataset.")
\ No newline at end of file
@@ -0,0 +1,372 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, date
+
+import pandas as pd
+import yaml
+
+
+# libyaml's C loader parses Cricsheet files several times faster than the
+# pure-Python SafeLoader; fall back to the latter when PyYAML was built without it.
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+
+DELIVERY_COLUMNS = [
+    'ID', 'match_id', 'innings', 'overs', 'ballnumber', 'batter', 'bowler', 'non-striker',
+    'extra_type', 'batsman_run', 'extras_run', 'total_run', 'non_boundary', 'isWicketDelivery',
+    'player_out', 'kind', 'fielders_involved', 'BattingTeam'
+]
+
+MATCH_COLUMNS = [
+    'ID', 'City', 'Date', 'Season', 'MatchNumber', 'Team1', 'Team2', 'Venue', 'TossWinner',
+    'TossDecision', 'SuperOver', 'WinningTeam', 'WonBy', 'Margin', 'Method', 'Player_of_Match',
+    'Team1Players', 'Team2Players', 'Umpire1', 'Umpire2'
+]
+
+
+def extract_number(filename):
+    match = re.search(r'\d+', filename)
+    if match:
+        return int(match.group())
+    else:
+        return 0
+
+
+def load_yaml(yaml_file_path):
+    with open(yaml_file_path, 'r') as file:
+        return yaml.load(file, Loader=SafeLoader)
+
+
+def list_yaml_files(yaml_dir):
+    yaml_files = sorted(os.listdir(yaml_dir), key=lambda x: extract_number(x))
+    return [yaml_file for yaml_file in yaml_files if yaml_file.endswith('.yaml')]
+
+
+def batting_first_team(match_info):
+    if match_info['toss']['decision'] == 'bat':
+        return match_info['toss']['winner']
+    return match_info['teams'][0] if match_info['teams'][1] == match_info['toss']['winner'] else match_info['teams'][1]
+
+
+def calculate_margin_and_won_by(match_info, batting_first, team1_runs, team2_runs, team2_wickets_lost):
+    if team1_runs == team2_runs:
+        return 'SuperOver', 'NA'
+    if 'outcome' in match_info and 'winner' in match_info['outcome']:
+        winning_team = match_info['outcome']['winner']
+        if winning_team == batting_first:
+            return 'runs', team1_runs - team2_runs
+        else:
+            return 'wickets', 10 - team2_wickets_lost
+    else:
+        return 'No result', 'NA'
+
+
+def extract_match_file(yaml_data, match_id, yaml_file_path=''):
+    # One walk over the innings yields the delivery rows, the run/wicket totals
+    # behind WonBy/Margin and both lineups, so each file is only traversed once.
+    match_info = yaml_data['info']
+    batting_first = batting_first_team(match_info)
+
+    deliveries_data = []
+    team_players = {}
+    team1_runs, team2_runs, team2_wickets_lost = 0, 0, 0
+
+    for inning in yaml_data['innings']:
+        for inning_name, inning_details in inning.items():
+            match = re.match(r'\d+', inning_name.split(' ')[0])
+            if match:
+                inning_number = int(match.group())
+            else:
+                inning_number = None
+                print(f"Skipping inning: {inning_name} in file {yaml_file_path}")
+
+            batting_team = inning_details['team']
+            batted_first = batting_team == batting_first
+            # dicts keep first-seen order, matching the old list-based de-duplication
+            players = team_players.setdefault(batting_team, {})
+            over_counter = 0
+            ball_counter = 0
+            current_bowler = None
+
+            for delivery_data in inning_details['deliveries']:
+                for ball, details in delivery_data.items():
+                    runs = details['runs']
+                    wicket = details.get('wicket')
+                    if batted_first:
+                        team1_runs += runs['total']
+                    else:
+                        team2_runs += runs['total']
+                        if wicket is not None:
+                            team2_wickets_lost += 1
+
+                    players.setdefault(details['batsman'])
+                    players.setdefault(details['non_striker'])
+                    players.setdefault(details['bowler'])
+
+                    if inning_number is None:
+                        continue
+
+                    ball_counter += 1
+
+                    if current_bowler is None or current_bowler != details['bowler']:
+                        if ball_counter >= 6:
+                            over_counter += 1
+                            ball_counter = 1
+                        current_bowler = details['bowler']
+
+                    deliveries_data.append((
+                        f"{match_id}{inning_number}{over_counter:02d}{ball_counter}",
+                        match_id,
+                        inning_number,
+                        over_counter,
+                        ball_counter,
+                        details['batsman'],
+                        details['bowler'],
+                        details['non_striker'],
+                        'NA' if 'extras' not in details else ', '.join(details['extras'].keys()),
+                        runs['batsman'],
+                        runs['extras'],
+                        runs['total'],
+                        details.get('non_boundary', 0),
+                        0 if wicket is None else 1,
+                        'NA' if wicket is None else wicket.get('player_out', 'NA'),
+                        'NA' if wicket is None else wicket.get('kind', 'NA'),
+                        'NA' if wicket is None else ', '.join(wicket.get('fielders', ['NA'])),
+                        batting_team
+                    ))
+
+    date_value = match_info['dates'][0]
+    date_value = date_value if isinstance(date_value, date) else datetime.strptime(date_value, '%Y-%m-%d').date()
+    won_by, margin = calculate_margin_and_won_by(match_info, batting_first, team1_runs, team2_runs, team2_wickets_lost)
+
+    # Season and MatchNumber depend on every other match, so they are filled in
+    # by assign_season_and_match_number once the combined table is assembled.
+    match_row = (
+        match_id,
+        match_info.get('city', 'NA'),
+        date_value.strftime('%Y-%m-%d'),
+        None,
+        None,
+        match_info['teams'][0],
+        match_info['teams'][1],
+        match_info.get('venue', 'NA'),
+        match_info['toss']['winner'],
+        match_info['toss']['decision'],
+        'Y' if won_by == 'SuperOver' else 'N',
+        match_info.get('outcome', {}).get('winner', 'NA'),
+        won_by,
+        margin,
+        match_info.get('method', 'NA'),
+        match_info.get('player_of_match', ['NA'])[0],
+        ', '.join(team_players.get(match_info['teams'][0], {})),
+        ', '.join(team_players.get(match_info['teams'][1], {})),
+        match_info.get('umpires', ['NA', 'NA'])[0],
+        match_info.get('umpires', ['NA', 'NA'])[1]
+    )
+    return deliveries_data, match_row
+
+
+def process_yaml_to_csv(yaml_file_path, csv_file_path, match_id):
+    deliveries_data, _ = extract_match_file(load_yaml(yaml_file_path), match_id, yaml_file_path)
+    deliveries_df = pd.DataFrame(deliveries_data, columns=DELIVERY_COLUMNS)
+    if csv_file_path is not None:
+        deliveries_df.to_csv(csv_file_path, index=False)
+    return deliveries_df
+
+
+def assign_season_and_match_number(matches_df):
+    # Seasons are numbered by first appearance and matches counted per year while
+    # walking the YAML files in plain sorted() filename order.
+    order = matches_df['ID'].astype(str).sort_values(kind='stable').index
+    years = matches_df.loc[order, 'Date'].str[:4].astype(int)
+    matches_df['Season'] = pd.Series(pd.factorize(years)[0] + 1, index=order)
+    matches_df['MatchNumber'] = years.groupby(years).cumcount() + 1
+    return matches_df
+
+
+OUTPUTS = {
+    'ball_by_ball': (DELIVERY_COLUMNS, None),
+    'matches': (MATCH_COLUMNS, assign_season_and_match_number),
+}
+
+
+def _parse_match_file(task):
+    yaml_file, yaml_file_path, csv_file_path = task
+    deliveries_data, match_row = extract_match_file(load_yaml(yaml_file_path), extract_number(yaml_file), yaml_file_path)
+    if csv_file_path is not None:
+        pd.DataFrame(deliveries_data, columns=DELIVERY_COLUMNS).to_csv(csv_file_path, index=False)
+    return yaml_file, deliveries_data, match_row
+
+
+def _map_tasks(func, tasks, workers):
+    if workers == 1:
+        for task in tasks:
+            yield func(task)
+        return
+    # Results come back in submission order, so the combined output stays sorted by match.
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(func, tasks, chunksize=8):
+            yield result
+
+
+def _flush_rows(rows, columns, csv_path, write_header):
+    pd.DataFrame(rows, columns=columns).to_csv(
+        csv_path, mode='w' if write_header else 'a', header=write_header, index=False)
+
+
+def _append_output(parsed_results, output, columns, combined_csv_path, manifest, chunk_rows):
+    row_count = manifest.total_rows(output) if manifest is not None else 0
+    write_header = row_count == 0
+    buffer = []
+    for yaml_file, rows in parsed_results:
+        if manifest is not None:
+            manifest.set_row_range(yaml_file, output, row_count + len(buffer), row_count + len(buffer) + len(rows))
+        buffer.extend(rows)
+        if len(buffer) >= chunk_rows:
+            _flush_rows(buffer, columns, combined_csv_path, write_header)
+            row_count += len(buffer)
+            write_header = False
+            buffer = []
+
+    if buffer or write_header:
+        _flush_rows(buffer, columns, combined_csv_path, write_header)
+        row_count += len(buffer)
+    return row_count
+
+
+def _splice_output(parsed_results, yaml_files, output, columns, combined_csv_path, manifest, finalize):
+    parsed = dict(parsed_results)
+
+    existing_df = None
+    if manifest is not None and os.path.exists(combined_csv_path) and manifest.total_rows(output) > 0:
+        # Read back as text so untouched rows are rewritten byte-for-byte ('NA' stays 'NA').
+        existing_df = pd.read_csv(combined_csv_path, dtype=str, keep_default_na=False)
+
+    segments = []
+    row_count = 0
+    for yaml_file in yaml_files:
+        if yaml_file in parsed:
+            segment = pd.DataFrame(parsed[yaml_file], columns=columns)
+        else:
+            start, stop = manifest.row_range(yaml_file, output)
+            segment = existing_df.iloc[start:stop]
+        if manifest is not None:
+            manifest.set_row_range(yaml_file, output, row_count, row_count + len(segment))
+        row_count += len(segment)
+        segments.append(segment)
+
+    combined_df = pd.concat(segments, ignore_index=True) if segments else pd.DataFrame(columns=columns)
+    if finalize is not None:
+        combined_df = finalize(combined_df)
+    combined_df.to_csv(combined_csv_path, index=False)
+    return row_count
+
+
+def _write_output(parsed_results, yaml_files, stale, removed, output, combined_csv_path, manifest, chunk_rows):
+    columns, finalize = OUTPUTS[output]
+
+    # New files that all sort after the ones already ingested can simply be appended;
+    # anything else (edits, deletions, back-filled matches) is spliced in by row range.
+    stale_set = set(stale)
+    kept_positions = [i for i, yaml_file in enumerate(yaml_files) if yaml_file not in stale_set]
+    appendable = (
+        finalize is None and not removed
+        and (manifest is None or all(manifest.row_range(yaml_file, output) is None for yaml_file in stale))
+        and (not kept_positions or not stale or max(kept_positions) < yaml_files.index(stale[0]))
+    )
+    if appendable:
+        return _append_output(parsed_results, output, columns, combined_csv_path, manifest, chunk_rows)
+
+    for yaml_file in removed:
+        manifest.forget(yaml_file, output)
+    return _splice_output(parsed_results, yaml_files, output, columns, combined_csv_path, manifest, finalize)
+
+
+def ingest_cricsheet(yaml_dir, ball_by_ball_csv_path=None, matches_csv_path=None, manifest=None, workers=None,
+                     chunk_rows=100000, csv_dir=None):
+    # Refreshes only the outputs that were given. The per-match CSVs in csv_dir
+    # are an output of their own, so a file is rewritten there only when its
+    # CSV is missing or older than the YAML, whichever table a run refreshes.
+    outputs = {output: path for output, path in (('ball_by_ball', ball_by_ball_csv_path), ('matches', matches_csv_path),
+                                                 ('match_csvs', csv_dir)) if path is not None}
+
+    def match_csv_path(yaml_file):
+        return os.path.join(csv_dir, yaml_file.replace('.yaml', '.csv'))
+
+    yaml_files = list_yaml_files(yaml_dir)
+    removed = {output: [] for output in outputs}
+    if manifest is None:
+        stale_by_output = {output: list(yaml_files) for output in outputs}
+    else:
+        manifest.refresh(yaml_dir, yaml_files)
+        stale_by_output = {}
+        for output, path in outputs.items():
+            manifest.bind_output(output, path)
+            stale_by_output[output] = [yaml_file for yaml_file in yaml_files if manifest.needs_parse(yaml_file, output)
+                                       or (output == 'match_csvs' and not os.path.exists(match_csv_path(yaml_file)))]
+            removed[output] = manifest.removed_files(yaml_files, output)
+    stale_sets = {output: set(files) for output, files in stale_by_output.items()}
+    # A file stale for any output is parsed once and refreshed in those outputs.
+    stale = [yaml_file for yaml_file in yaml_files if any(yaml_file in files for files in stale_sets.values())]
+    if manifest is not None:
+        if not stale and not any(removed.values()):
+            print("Combined outputs are up to date")
+            return {output: manifest.total_rows(output) for output in outputs if output != 'match_csvs'}
+        print(f"Re-parsing {len(stale)} of {len(yaml_files)} files, "
+              f"dropping {max(len(files) for files in removed.values())}")
+
+    tasks = []
+    for yaml_file in stale:
+        csv_file_path = match_csv_path(yaml_file) if yaml_file in stale_sets.get('match_csvs', ()) else None
+        tasks.append((yaml_file, os.path.join(yaml_dir, yaml_file), csv_file_path))
+
+    # Delivery rows stream straight to the ball-by-ball output while the much
+    # smaller match rows are collected for the matches table.
+    match_rows = []
+    written_csvs = []
+
+    def delivery_results():
+        for yaml_file, deliveries_data, match_row in _map_tasks(_parse_match_file, tasks, workers):
+            print(f"Processed: {yaml_file}")
+            if yaml_file in stale_sets.get('match_csvs', ()):
+                written_csvs.append((yaml_file, len(deliveries_data)))
+            if yaml_file in stale_sets.get('matches', ()):
+                match_rows.append((yaml_file, [match_row]))
+            if yaml_file in stale_sets.get('ball_by_ball', ()):
+                yield yaml_file, deliveries_data
+
+    row_counts = {}
+    # Outputs with nothing new or removed are left as they are.
+    for output in ('ball_by_ball', 'matches'):
+        if output in outputs and manifest is not None and not stale_by_output[output] and not removed[output]:
+            row_counts[output] = manifest.total_rows(output)
+            del outputs[output]
+    if 'ball_by_ball' in outputs:
+        row_counts['ball_by_ball'] = _write_output(delivery_results(), yaml_files, stale_by_output['ball_by_ball'],
+                                                   removed['ball_by_ball'], 'ball_by_ball', outputs['ball_by_ball'],
+                                                   manifest, chunk_rows)
+    else:
+        for _ in delivery_results():
+            pass
+    if 'matches' in outputs:
+        row_counts['matches'] = _write_output(match_rows, yaml_files, stale_by_output['matches'], removed['matches'],
+                                              'matches', outputs['matches'], manifest, chunk_rows)
+    if 'match_csvs' in outputs:
+        row_counts['match_csvs'] = len(written_csvs)
+        if manifest is not None:
+            # Each per-match CSV is its own file, so its rows start at 0.
+            for yaml_file, row_count in written_csvs:
+                manifest.set_row_range(yaml_file, 'match_csvs', 0, row_count)
+            # A removed YAML file takes its CSV with it, as a full rebuild would.
+            for yaml_file in removed['match_csvs']:
+                if os.path.exists(match_csv_path(yaml_file)):
+                    os.remove(match_csv_path(yaml_file))
+                manifest.forget(yaml_file, 'match_csvs')
+
+    if manifest is not None:
+        manifest.save()
+    return row_counts
@@ -0,0 +1,276 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from player_registry import MISSING, PlayerRegistry
+
+
+# Run and flag columns are int16 rather than int8: pandas casts groupby UDF results
+# back to the input dtype, and per-innings counts and sums can exceed 127.
+BALL_BY_BALL_DTYPES = {
+    'ID': 'int64',
+    'match_id': 'int32',
+    'innings': 'int8',
+    'overs': 'int8',
+    'ballnumber': 'int8',
+    'batter': 'category',
+    'bowler': 'category',
+    'non-striker': 'category',
+    'extra_type': 'category',
+    'batsman_run': 'int16',
+    'extras_run': 'int16',
+    'total_run': 'int16',
+    'non_boundary': 'int16',
+    'isWicketDelivery': 'int16',
+    'player_out': 'category',
+    'kind': 'category',
+    'fielders_involved': 'category',
+    'BattingTeam': 'category',
+}
+
+MATCHES_DTYPES = {
+    'ID': 'int32',
+    'City': 'category',
+    'Season': 'int16',
+    'MatchNumber': 'int16',
+    'Team1': 'category',
+    'Team2': 'category',
+    'Venue': 'category',
+    'TossWinner': 'category',
+    'TossDecision': 'category',
+    'SuperOver': 'category',
+    'WinningTeam': 'category',
+    'WonBy': 'category',
+    'Method': 'category',
+    'Player_of_Match': 'category',
+    'Umpire1': 'category',
+    'Umpire2': 'category',
+}
+
+LINEUP_COLUMNS = ['Team1Players', 'Team2Players']
+
+# Everything the Dream11 points calculations read from the deliveries table.
+SCORING_COLUMNS = [
+    'match_id', 'overs', 'ballnumber', 'batter', 'bowler', 'extra_type', 'batsman_run', 'total_run',
+    'isWicketDelivery', 'kind', 'fielders_involved', 'BattingTeam'
+]
+
+PARTITION_COLUMN = 'year'
+
+REGISTRY_FILENAME = 'player_registry.json'
+
+PLAYER_SCORES_COLUMNS = ['player', 'match_id', 'date', 'fantasy_score']
+
+
+def to_typed_matches(matches_df):
+    matches_df = matches_df.copy()
+    matches_df['Date'] = pd.to_datetime(matches_df['Date'])
+    for column, dtype in MATCHES_DTYPES.items():
+        if column in matches_df.columns:
+            matches_df[column] = matches_df[column].astype(dtype)
+    for column in LINEUP_COLUMNS:
+        if column in matches_df.columns:
+            matches_df[column] = matches_df[column].map(
+                lambda x: x.split(', ') if isinstance(x, str) else list(x) if isinstance(x, (list, np.ndarray)) else [])
+    return matches_df
+
+
+def to_typed_ball_by_ball(ball_by_ball_df):
+    ball_by_ball_df = ball_by_ball_df.copy()
+    for column, dtype in BALL_BY_BALL_DTYPES.items():
+        if column in ball_by_ball_df.columns:
+            ball_by_ball_df[column] = ball_by_ball_df[column].astype(dtype)
+    return ball_by_ball_df
+
+
+def missing_values(series):
+    # NaN in name columns, MISSING once they are registry-coded.
+    if pd.api.types.is_integer_dtype(series):
+        return series == MISSING
+    return series.isna()
+
+
+def replace_values(series, mapping):
+    # Series.replace cannot introduce new categories, so categoricals are remapped per category.
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.map(lambda value: mapping.get(value, value)).astype('category')
+    return series.replace(mapping)
+
+
+def _write_partitioned(df, path, columns_schema=None):
+    table = pa.Table.from_pandas(df, preserve_index=False, schema=columns_schema)
+    # Only the seasons present in df are replaced; other partitions are left alone.
+    ds.write_dataset(
+        table, path, format='parquet',
+        partitioning=ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.int16())]), flavor='hive'),
+        existing_data_behavior='delete_matching',
+        basename_template='part-{i}.parquet'
+    )
+
+
+def write_store(matches_df, ball_by_ball_df, store_dir):
+    matches_df = to_typed_matches(matches_df)
+    ball_by_ball_df = to_typed_ball_by_ball(ball_by_ball_df)
+
+    matches_df[PARTITION_COLUMN] = matches_df['Date'].dt.year.astype('int16')
+    match_years = matches_df.set_index('ID')[PARTITION_COLUMN]
+    delivery_years = ball_by_ball_df['match_id'].map(match_years)
+    # Deliveries of matches missing from the matches table have no season to go in.
+    orphaned = delivery_years.isna()
+    if orphaned.any():
+        print(f"Dropping {int(orphaned.sum())} deliveries of {ball_by_ball_df.loc[orphaned, 'match_id'].nunique()} "
+              f"matches not in the matches table")
+        ball_by_ball_df = ball_by_ball_df[~orphaned].reset_index(drop=True)
+        delivery_years = delivery_years[~orphaned].reset_index(drop=True)
+    ball_by_ball_df[PARTITION_COLUMN] = delivery_years.astype('int16')
+
+    lineup_type = pa.list_(pa.string())
+    matches_schema = pa.Schema.from_pandas(matches_df, preserve_index=False)
+    for column in LINEUP_COLUMNS:
+        matches_schema = matches_schema.set(matches_schema.get_field_index(column), pa.field(column, lineup_type))
+
+    _write_partitioned(matches_df, os.path.join(store_dir, 'matches'), matches_schema)
+    _write_partitioned(ball_by_ball_df, os.path.join(store_dir, 'ball_by_ball'))
+
+    # New names get the next free ids; existing ids never move between rebuilds.
+    registry = load_registry(store_dir)
+    registry.register_matches(matches_df)
+    registry.register_ball_by_ball(ball_by_ball_df)
+    registry.save(os.path.join(store_dir, REGISTRY_FILENAME))
+    return registry
+
+
+def load_registry(store_dir):
+    return PlayerRegistry.load(os.path.join(store_dir, REGISTRY_FILENAME))
+
+
+def build_store_from_csv(matches_csv_path, ball_by_ball_csv_path, store_dir):
+    matches_df = pd.read_csv(matches_csv_path)
+    ball_by_ball_df = pd.read_csv(ball_by_ball_csv_path)
+    return write_store(matches_df, ball_by_ball_df, store_dir)
+
+
+def _read_partitioned(path, columns=None, seasons=None):
+    filters = None
+    if seasons is not None:
+        filters = [(PARTITION_COLUMN, 'in', [int(season) for season in seasons])]
+    df = pd.read_parquet(path, columns=columns, filters=filters)
+    if PARTITION_COLUMN in df.columns:
+        df[PARTITION_COLUMN] = df[PARTITION_COLUMN].astype('int16')
+    return df
+
+
+def read_matches(matches_path, columns=None, seasons=None, registry=None):
+    matches_df = _read_partitioned(matches_path, columns, seasons)
+    if registry is not None:
+        matches_df = registry.encode_matches(matches_df)
+    else:
+        for column in LINEUP_COLUMNS:
+            if column in matches_df.columns:
+                # Arrow hands list cells back as numpy arrays; the scripts expect lists.
+                matches_df[column] = matches_df[column].map(list)
+    return matches_df.sort_values('ID', ignore_index=True) if 'ID' in matches_df.columns else matches_df
+
+
+def read_ball_by_ball(ball_by_ball_path, columns=None, seasons=None, registry=None):
+    ball_by_ball_df = _read_partitioned(ball_by_ball_path, columns, seasons)
+    if registry is not None:
+        # Categorical columns are mapped to registry ids one category at a time.
+        ball_by_ball_df = registry.encode_ball_by_ball(ball_by_ball_df)
+    return ball_by_ball_df
+
+
+def write_player_scores(player_scores_df, path, row_group_size=8192):
+    # One file sorted by player: row-group statistics let a reader pull a few
+    # players without scanning everyone else's history.
+    player_scores_df = player_scores_df[PLAYER_SCORES_COLUMNS].sort_values('player', kind='stable')
+    table = pa.Table.from_pandas(player_scores_df, preserve_index=False)
+    pq.write_table(table, path, row_group_size=row_group_size)
+
+
+def read_player_scores(path, players=None):
+    filters = None
+    if players is not None:
+        filters = [('player', 'in', list(players))]
+    return pd.read_parquet(path, filters=filters)
+
+
+def _score_dates(dates):
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    try:
+        return pd.to_datetime(dates, format='ISO8601')
+    except ValueError:
+        # Per-player CSVs from before the ISO export used day/month/year.
+        return pd.to_datetime(dates, format='%d/%m/%y')
+
+
+def load_player_scores(source, players=None):
+    # The requested players' score series in one frame with a typed date column,
+    # from either the consolidated player_fantasy_scores.parquet or a directory
+    # of per-player CSVs, where each file is opened by name instead of listing
+    # and filtering the directory. players=None loads everyone.
+    if players is None and not os.path.isfile(source):
+        players = sorted(filename[:-4] for filename in os.listdir(source) if filename.endswith('.csv'))
+    elif players is not None:
+        players = list(dict.fromkeys(players))
+    if os.path.isfile(source):
+        player_scores_df = read_player_scores(source, players)
+    else:
+        frames = []
+        for player in players:
+            player_csv_path = os.path.join(source, f"{player}.csv")
+            if os.path.exists(player_csv_path):
+                # Dates are parsed per file; old and new exports use different formats.
+                player_df = pd.read_csv(player_csv_path).assign(player=player)
+                player_df['date'] = _score_dates(player_df['date'])
+                frames.append(player_df)
+        if not frames:
+            return pd.DataFrame(columns=PLAYER_SCORES_COLUMNS)
+        player_scores_df = pd.concat(frames, ignore_index=True)
+    player_scores_df = player_scores_df[PLAYER_SCORES_COLUMNS]
+    player_scores_df['date'] = _score_dates(player_scores_df['date'])
+    return player_scores_df.reset_index(drop=True)
+
+
+class MatchIndex:
+    # The table sorted by its match key plus an offsets array, so one match's rows
+    # are a contiguous positional slice rather than a boolean scan of every row.
+
+    def __init__(self, df, key='match_id'):
+        keys = df[key].to_numpy()
+        if len(keys) > 1 and not (keys[1:] >= keys[:-1]).all():
+            order = np.argsort(keys, kind='stable')
+            df = df.iloc[order]
+            keys = keys[order]
+        match_ids, starts = np.unique(keys, return_index=True)
+        self.df = df
+        self.key = key
+        self.offsets = np.append(starts, len(keys))
+        self.positions = {match_id: i for i, match_id in enumerate(match_ids.tolist())}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, match_id):
+        return match_id in self.positions
+
+    def match(self, match_id):
+        i = self.positions.get(match_id)
+        if i is None:
+            return self.df.iloc[0:0]
+        return self.df.iloc[self.offsets[i]:self.offsets[i + 1]]
+
+
+def select_match(data, match_id, key='match_id'):
+    if isinstance(data, MatchIndex):
+        return data.match(match_id)
+    return data[data[key] == match_id]
+
+
+def is_store_path(path):
+    return os.path.isdir(path)
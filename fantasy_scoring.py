@@ -0,0 +1,317 @@
+import numpy as np
+import pandas as pd
+
+from cricsheet_ingestion import DELIVERY_COLUMNS
+from player_registry import MISSING
+from scoring_rules import DREAM11_T20_RULES, band_points, compile_rules
+
+
+# Bump whenever the scoring kernel itself changes so cached points tables are
+# recomputed; changes to a rule set are picked up from its fingerprint.
+SCORING_RULES_VERSION = 2
+
+POINTS_COLUMNS = ['total_batting_points', 'total_bowling_points', 'fielding_points', 'starting_xi_points',
+                  'total_points']
+
+
+def _player_keys(values):
+    # Categoricals from different columns cannot be stacked without losing their
+    # dtype, so names are compared as plain objects; registry ids pass straight through.
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.astype(object)
+    return values
+
+
+def _compiled(rules):
+    return rules if rules.get('compiled') else compile_rules(rules)
+
+
+def strike_rate_points(runs_scored, balls_faced, rules=DREAM11_T20_RULES):
+    batting = _compiled(rules)['batting']
+    runs_scored = np.asarray(runs_scored, dtype=float)
+    balls_faced = np.asarray(balls_faced, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        strike_rate = (runs_scored / balls_faced) * 100
+    points = band_points(batting['strike_rate'], strike_rate)
+    return np.where(balls_faced >= batting['strike_rate_min_balls'], points, 0)
+
+
+def economy_rate_points(overs_bowled, economy_rate, rules=DREAM11_T20_RULES):
+    bowling = _compiled(rules)['bowling']
+    overs_bowled = np.asarray(overs_bowled, dtype=float)
+    points = band_points(bowling['economy_rate'], economy_rate)
+    return np.where(overs_bowled >= bowling['economy_min_overs'], points, 0)
+
+
+def batting_stats(ball_by_ball_df):
+    batsman_run = ball_by_ball_df['batsman_run'].to_numpy()
+    return pd.DataFrame({
+        'match_id': ball_by_ball_df['match_id'].to_numpy(),
+        'player': _player_keys(ball_by_ball_df['batter']).to_numpy(),
+        'runs_scored': batsman_run.astype(np.int64),
+        'balls_faced': ball_by_ball_df['ballnumber'].notna().to_numpy().astype(np.int64),
+        'fours': (batsman_run == 4).astype(np.int64),
+        'sixes': (batsman_run == 6).astype(np.int64),
+        'ducks': ((batsman_run == 0) & (ball_by_ball_df['isWicketDelivery'].to_numpy() == 1)).astype(np.int64),
+    }).groupby(['match_id', 'player'], sort=False).sum().reset_index()
+
+
+def bowling_stats(ball_by_ball_df, wicket_kinds=DREAM11_T20_RULES['bowling']['wicket_kinds']):
+    kind = ball_by_ball_df['kind']
+    total_run = ball_by_ball_df['total_run'].to_numpy().astype(np.int64)
+    legal = ~ball_by_ball_df['extra_type'].isin(['noball', 'wide']).to_numpy()
+    deliveries = pd.DataFrame({
+        'match_id': ball_by_ball_df['match_id'].to_numpy(),
+        'player': _player_keys(ball_by_ball_df['bowler']).to_numpy(),
+        'overs': ball_by_ball_df['overs'].to_numpy(),
+        'wickets': kind.isin(wicket_kinds).to_numpy().astype(np.int64),
+        'lbw_bowled': kind.isin(['lbw', 'bowled']).to_numpy().astype(np.int64),
+        'balls_bowled': legal.astype(np.int64),
+        'runs_conceded': total_run,
+        'legal_runs': np.where(legal, total_run, 0),
+    })
+
+    # Maidens: (bowler, over) groups of legal deliveries that conceded nothing.
+    overs = deliveries[legal].groupby(['match_id', 'player', 'overs'], sort=False)['legal_runs'].sum()
+    maiden_overs = (overs == 0).groupby(level=['match_id', 'player'], sort=False).sum().rename('maiden_overs')
+
+    bowling = deliveries.groupby(['match_id', 'player'], sort=False)[
+        ['wickets', 'lbw_bowled', 'balls_bowled', 'runs_conceded']].sum()
+    return bowling.join(maiden_overs, how='left').fillna({'maiden_overs': 0}).astype({'maiden_overs': np.int64}).reset_index()
+
+
+def fielding_stats(ball_by_ball_df):
+    kind = ball_by_ball_df['kind']
+    fielders = _player_keys(ball_by_ball_df['fielders_involved']).to_numpy()
+    dismissals = kind.isin(['caught', 'stumped', 'run out']).to_numpy()
+    if fielders.dtype.kind in 'iu':
+        dismissals = dismissals & (fielders != MISSING)
+    return pd.DataFrame({
+        'match_id': ball_by_ball_df['match_id'].to_numpy()[dismissals],
+        'player': fielders[dismissals],
+        'catches': (kind.to_numpy()[dismissals] == 'caught').astype(np.int64),
+        'stumpings': (kind.to_numpy()[dismissals] == 'stumped').astype(np.int64),
+        'run_outs': (kind.to_numpy()[dismissals] == 'run out').astype(np.int64),
+    }).groupby(['match_id', 'player'], sort=False).sum().reset_index()
+
+
+def batting_points(batting, rules=DREAM11_T20_RULES):
+    compiled = _compiled(rules)
+    spec = compiled['batting']
+    batting = batting.copy()
+    runs_scored = batting['runs_scored'].to_numpy()
+    batting['batting_points'] = (
+        spec['run'] * runs_scored + spec['four_bonus'] * batting['fours'].to_numpy()
+        + spec['six_bonus'] * batting['sixes'].to_numpy() + spec['duck'] * (batting['ducks'].to_numpy() > 0)
+    )
+    batting['bonus_points'] = band_points(spec['milestones'], runs_scored)
+    batting['strike_rate_points'] = strike_rate_points(runs_scored, batting['balls_faced'].to_numpy(), compiled)
+    batting['total_batting_points'] = batting['batting_points'] + batting['bonus_points'] + batting['strike_rate_points']
+    return batting
+
+
+def bowling_points(bowling, rules=DREAM11_T20_RULES):
+    compiled = _compiled(rules)
+    spec = compiled['bowling']
+    if spec['requires_wicket']:
+        bowling = bowling[bowling['wickets'] > 0]
+    bowling = bowling.reset_index(drop=True)
+
+    wickets = bowling['wickets'].to_numpy()
+    bowling['wicket_points'] = spec['wicket'] * wickets
+    bowling['bonus_points'] = band_points(spec['hauls'], wickets) + spec['lbw_bowled_bonus'] * bowling['lbw_bowled'].to_numpy()
+    bowling['overs_bowled'] = bowling['balls_bowled'] // 6
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bowling['economy_rate'] = bowling['runs_conceded'] / bowling['overs_bowled']
+    bowling['economy_rate_points'] = economy_rate_points(bowling['overs_bowled'], bowling['economy_rate'], compiled)
+    bowling['maiden_over_points'] = spec['maiden'] * bowling['maiden_overs']
+    bowling['total_bowling_points'] = (
+        bowling['wicket_points'] + bowling['bonus_points'] + bowling['economy_rate_points'] + bowling['maiden_over_points']
+    )
+    return bowling
+
+
+def fielding_points(fielding, rules=DREAM11_T20_RULES):
+    spec = _compiled(rules)['fielding']
+    fielding = fielding.copy()
+    fielding['catch_bonus'] = band_points(spec['catch_bonuses'], fielding['catches'].to_numpy())
+    fielding['fielding_points'] = (
+        spec['catch'] * fielding['catches'] + fielding['catch_bonus']
+        + spec['stumping'] * fielding['stumpings'] + spec['run_out'] * fielding['run_outs']
+    )
+    return fielding
+
+
+def score_batting(ball_by_ball_df, rules=DREAM11_T20_RULES):
+    return batting_points(batting_stats(ball_by_ball_df), rules)
+
+
+def score_bowling(ball_by_ball_df, rules=DREAM11_T20_RULES):
+    return bowling_points(bowling_stats(ball_by_ball_df, rules['bowling']['wicket_kinds']), rules)
+
+
+def score_fielding(ball_by_ball_df, rules=DREAM11_T20_RULES):
+    return fielding_points(fielding_stats(ball_by_ball_df), rules)
+
+
+def total_points(batting, bowling, fielding, rules=DREAM11_T20_RULES):
+    points = pd.concat([
+        batting[['match_id', 'player', 'total_batting_points']],
+        bowling[['match_id', 'player', 'total_bowling_points']],
+        fielding[['match_id', 'player', 'fielding_points']],
+    ], ignore_index=True)
+    points = points.groupby(['match_id', 'player'], sort=False)[
+        ['total_batting_points', 'total_bowling_points', 'fielding_points']].sum(min_count=0).reset_index()
+
+    points['starting_xi_points'] = rules['starting_xi']
+    points['total_points'] = (
+        points['total_batting_points'] + points['total_bowling_points'] + points['fielding_points']
+        + points['starting_xi_points']
+    )
+    # Float points, as the outer merges in aggregate_player_points produce.
+    points[POINTS_COLUMNS] = points[POINTS_COLUMNS].astype(np.float64)
+    points = points.sort_values(['match_id', 'total_points'], ascending=[True, False], kind='stable')
+    return points.reset_index(drop=True)
+
+
+def score_all_matches(ball_by_ball_df, rules=DREAM11_T20_RULES):
+    # Dream11 points for every (match, player) pair in one grouped pass; per match
+    # this reproduces aggregate_player_points row for row.
+    compiled = _compiled(rules)
+    return total_points(score_batting(ball_by_ball_df, compiled), score_bowling(ball_by_ball_df, compiled),
+                        score_fielding(ball_by_ball_df, compiled), compiled)
+
+
+def score_rule_sets(ball_by_ball_df, rule_sets):
+    # The deliveries are aggregated once; each rule set only reruns the points kernel.
+    batting = batting_stats(ball_by_ball_df)
+    fielding = fielding_stats(ball_by_ball_df)
+    bowling_by_kinds = {}
+
+    scored = []
+    for rules in rule_sets:
+        compiled = _compiled(rules)
+        wicket_kinds = tuple(compiled['bowling']['wicket_kinds'])
+        if wicket_kinds not in bowling_by_kinds:
+            bowling_by_kinds[wicket_kinds] = bowling_stats(ball_by_ball_df, list(wicket_kinds))
+        points = total_points(batting_points(batting, compiled), bowling_points(bowling_by_kinds[wicket_kinds], compiled),
+                              fielding_points(fielding, compiled), compiled)
+        scored.append(points.assign(rules=compiled['name']))
+    return pd.concat(scored, ignore_index=True)
+
+
+def _is_missing(value):
+    return value is None or value == 'NA' or (isinstance(value, float) and np.isnan(value))
+
+
+class LiveMatchPoints:
+    # Running Dream11 points for one match, fed one delivery at a time in the
+    # ball_by_ball schema. Only the batter, bowler and fielder named on a delivery
+    # are rescored, so each delivery costs the same however far the match has got.
+
+    def __init__(self, rules=DREAM11_T20_RULES):
+        self.rules = _compiled(rules)
+        self.batting = {}
+        self.bowling = {}
+        self.fielding = {}
+        self.over_runs = {}
+        self.points = {}
+
+    def _batting_state(self, player):
+        if player not in self.batting:
+            self.batting[player] = {'runs': 0, 'balls': 0, 'fours': 0, 'sixes': 0, 'ducks': 0, 'points': 0}
+        return self.batting[player]
+
+    def _bowling_state(self, player):
+        if player not in self.bowling:
+            self.bowling[player] = {'wickets': 0, 'lbw_bowled': 0, 'balls': 0, 'runs': 0, 'maidens': 0, 'points': 0}
+        return self.bowling[player]
+
+    def _fielding_state(self, player):
+        if player not in self.fielding:
+            self.fielding[player] = {'catches': 0, 'stumpings': 0, 'run_outs': 0, 'points': 0}
+        return self.fielding[player]
+
+    def _update_total(self, player):
+        total = 0
+        for table in (self.batting, self.bowling, self.fielding):
+            if player in table:
+                total += table[player]['points']
+        self.points[player] = total + self.rules['starting_xi']
+
+    def add_delivery(self, delivery):
+        if not isinstance(delivery, dict):
+            delivery = dict(zip(DELIVERY_COLUMNS, delivery))
+        kind = None if _is_missing(delivery['kind']) else delivery['kind']
+        batsman_run = int(delivery['batsman_run'])
+        total_run = int(delivery['total_run'])
+
+        batter = delivery['batter']
+        state = self._batting_state(batter)
+        state['runs'] += batsman_run
+        if not _is_missing(delivery['ballnumber']):
+            state['balls'] += 1
+        state['fours'] += batsman_run == 4
+        state['sixes'] += batsman_run == 6
+        state['ducks'] += batsman_run == 0 and int(delivery['isWicketDelivery']) == 1
+        spec = self.rules['batting']
+        state['points'] = (
+            spec['run'] * state['runs'] + spec['four_bonus'] * state['fours'] + spec['six_bonus'] * state['sixes']
+            + spec['duck'] * (state['ducks'] > 0) + int(band_points(spec['milestones'], state['runs']))
+            + int(strike_rate_points(state['runs'], state['balls'], self.rules))
+        )
+        self._update_total(batter)
+
+        bowler = delivery['bowler']
+        state = self._bowling_state(bowler)
+        spec = self.rules['bowling']
+        state['wickets'] += kind in spec['wicket_kinds']
+        state['lbw_bowled'] += kind in ('lbw', 'bowled')
+        state['runs'] += total_run
+        if _is_missing(delivery['extra_type']) or delivery['extra_type'] not in ('noball', 'wide'):
+            state['balls'] += 1
+            over = (bowler, delivery['overs'])
+            if over not in self.over_runs:
+                self.over_runs[over] = total_run
+                state['maidens'] += total_run == 0
+            else:
+                was_maiden = self.over_runs[over] == 0
+                self.over_runs[over] += total_run
+                state['maidens'] -= was_maiden and total_run != 0
+        if state['wickets'] > 0 or not spec['requires_wicket']:
+            wickets = state['wickets']
+            overs_bowled = state['balls'] // 6
+            economy_rate = state['runs'] / overs_bowled if overs_bowled else np.inf
+            state['points'] = (
+                spec['wicket'] * wickets + int(band_points(spec['hauls'], wickets))
+                + spec['lbw_bowled_bonus'] * state['lbw_bowled']
+                + int(economy_rate_points(overs_bowled, economy_rate, self.rules)) + spec['maiden'] * state['maidens']
+            )
+            self._update_total(bowler)
+
+        fielder = delivery['fielders_involved']
+        if kind in ('caught', 'stumped', 'run out') and not _is_missing(fielder):
+            state = self._fielding_state(fielder)
+            state['catches'] += kind == 'caught'
+            state['stumpings'] += kind == 'stumped'
+            state['run_outs'] += kind == 'run out'
+            spec = self.rules['fielding']
+            state['points'] = (
+                spec['catch'] * state['catches'] + int(band_points(spec['catch_bonuses'], state['catches']))
+                + spec['stumping'] * state['stumpings'] + spec['run_out'] * state['run_outs']
+            )
+            self._update_total(fielder)
+
+    def player_points(self, player):
+        return self.points.get(player, self.rules['starting_xi'])
+
+    def points_table(self):
+        rows = []
+        for player, total in self.points.items():
+            batting = self.batting.get(player, {}).get('points', 0)
+            bowling = self.bowling.get(player, {}).get('points', 0)
+            fielding = self.fielding.get(player, {}).get('points', 0)
+            rows.append((player, batting, bowling, fielding, self.rules['starting_xi'], total))
+        total_points = pd.DataFrame(rows, columns=['player'] + POINTS_COLUMNS)
+        total_points[POINTS_COLUMNS] = total_points[POINTS_COLUMNS].astype(np.float64)
+        return total_points.sort_values('total_points', ascending=False, kind='stable').reset_index(drop=True)
@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+
+from player_registry import MISSING
+
+
+# Feature columns of extracted_features_df, in the order the notebook concatenates them.
+FEATURE_COLUMNS = [
+    'Batsmen Averages',
+    'Strike Rates',
+    'Average Balls Faced',
+    'Centuries',
+    'Half-Centuries',
+    'Fours per Innings',
+    'Sixes per Innings',
+    'Dot Ball Percentage (Batsman)',
+    'Dot Ball Percentage (Bowlers)',
+    'Bowling Averages',
+    'Balls per Wicket',
+    'Wickets per Game',
+    'Economy Rates',
+    'Sixes Conceded per Over',
+    'Fours Conceded per Over',
+    'Average Overs per Match',
+    'Boundary Frequency (Batsmen)',
+    'Boundary Frequency (Bowlers)',
+]
+
+MIN_BALLS = 200
+MIN_OVERS = 32
+
+
+def standardize(values, higher_is_better=True):
+    standardized = (values - values.mean()) / values.std()
+    return standardized if higher_is_better else -standardized
+
+
+def _is_out(player_out):
+    if pd.api.types.is_integer_dtype(player_out):
+        return (player_out != MISSING).to_numpy()
+    return player_out.notna().to_numpy()
+
+
+def batting_match_totals(ball_by_ball_df, key='match_id'):
+    # Per (batter, match) counts; summed over matches they give every career
+    # batting total the features are built from. Run columns are widened to
+    # int64 first: grouped sums keep the store's int16 dtype, which
+    # per-100-balls rates would overflow.
+    runs = ball_by_ball_df['batsman_run'].to_numpy(dtype=np.int64)
+    extra_type = ball_by_ball_df['extra_type']
+    deliveries = pd.DataFrame({
+        'player': ball_by_ball_df['batter'],
+        'match': ball_by_ball_df[key],
+        'runs': runs,
+        # Balls faced leave out wides and no-balls that carried extras.
+        'legal': ((ball_by_ball_df['extras_run'] == 0) | ~extra_type.isin(['wides', 'noballs'])).to_numpy(),
+        'strike_runs': np.where(~extra_type.eq('legbyes').to_numpy(), runs, 0),
+        'fours': runs == 4,
+        'sixes': runs == 6,
+        'dots': runs == 0,
+    })
+    totals = deliveries.groupby(['player', 'match'], observed=True).agg(
+        balls=('runs', 'size'),
+        runs=('runs', 'sum'),
+        legal=('legal', 'sum'),
+        strike_runs=('strike_runs', 'sum'),
+        fours=('fours', 'sum'),
+        sixes=('sixes', 'sum'),
+        dots=('dots', 'sum'),
+    )
+    totals['innings'] = 1
+    totals['centuries'] = (totals['runs'] >= 100).astype(np.int64)
+    totals['half_centuries'] = ((totals['runs'] >= 50) & (totals['runs'] < 100)).astype(np.int64)
+    return totals.add_prefix('batting_')
+
+
+def bowling_match_totals(ball_by_ball_df, key='match_id'):
+    runs = ball_by_ball_df['batsman_run'].to_numpy(dtype=np.int64)
+    extra_type = ball_by_ball_df['extra_type']
+    out = _is_out(ball_by_ball_df['player_out'])
+    # The delivery after a bowler's no-ball is a free hit; wickets on it, on the
+    # no-ball itself and run outs are not credited to the bowler.
+    free_hit = (extra_type.groupby(ball_by_ball_df['bowler'], observed=True).shift(1) == 'noballs').to_numpy()
+    deliveries = pd.DataFrame({
+        'player': ball_by_ball_df['bowler'],
+        'match': ball_by_ball_df[key],
+        'total_run': ball_by_ball_df['total_run'].to_numpy(dtype=np.int64),
+        'wickets': out & ~ball_by_ball_df['kind'].eq('run out').to_numpy()
+        & ~extra_type.eq('noballs').to_numpy() & ~free_hit,
+        'dismissals': out,
+        'dots': ((ball_by_ball_df['total_run'] == 0) & ~extra_type.isin(['wides', 'noballs'])).to_numpy(),
+        'fours': runs == 4,
+        'sixes': runs == 6,
+    })
+    totals = deliveries.groupby(['player', 'match'], observed=True).agg(
+        balls=('total_run', 'size'),
+        runs=('total_run', 'sum'),
+        wickets=('wickets', 'sum'),
+        dismissals=('dismissals', 'sum'),
+        dots=('dots', 'sum'),
+        fours=('fours', 'sum'),
+        sixes=('sixes', 'sum'),
+    )
+    totals['games'] = 1
+    # Completed overs are counted per match.
+    totals['overs'] = totals['balls'] // 6
+    return totals.add_prefix('bowling_')
+
+
+def player_match_totals(ball_by_ball_df, key='match_id'):
+    # One row per (player, match) with batting, bowling and dismissal counts,
+    # 0 where the player did not bat or bowl. 'appearances' counts matches the
+    # player batted or bowled in.
+    out = _is_out(ball_by_ball_df['player_out'])
+    dismissals = pd.DataFrame({
+        'player': ball_by_ball_df['player_out'][out],
+        'match': ball_by_ball_df[key][out],
+    }).groupby(['player', 'match'], observed=True).size().rename('dismissed')
+    totals = pd.concat([
+        _player_match_index(batting_match_totals(ball_by_ball_df, key)),
+        _player_match_index(bowling_match_totals(ball_by_ball_df, key)),
+        _player_match_index(dismissals.to_frame()),
+    ], axis=1).fillna(0).astype(np.int64)
+    totals['appearances'] = ((totals['batting_balls'] > 0) | (totals['bowling_balls'] > 0)).astype(np.int64)
+    return totals
+
+
+def _player_match_index(totals):
+    totals.index = pd.MultiIndex.from_arrays(
+        [np.asarray(totals.index.get_level_values(0), dtype=object), totals.index.get_level_values(1)],
+        names=['player', 'match'])
+    return totals
+
+
+def batting_features(totals):
+    # totals holds one row of summed player_match_totals per player.
+    balls = totals['batting_balls'] >= MIN_BALLS
+    legal_balls = totals['batting_legal'] >= MIN_BALLS
+    dismissals = totals['dismissed']
+    centuries = totals['batting_centuries']
+    half_centuries = totals['batting_half_centuries']
+    innings = totals['batting_innings']
+    return pd.DataFrame({
+        'Batsmen Averages': standardize((totals['batting_runs'] / dismissals)[balls & (dismissals > 0)]),
+        'Strike Rates': standardize((totals['batting_strike_runs'] * 100 / totals['batting_legal'])[legal_balls]),
+        'Average Balls Faced': standardize((totals['batting_legal'] / innings)[legal_balls]),
+        'Centuries': standardize(centuries[centuries > 0]),
+        'Half-Centuries': standardize(half_centuries[half_centuries >= 1]),
+        'Fours per Innings': standardize((totals['batting_fours'] / innings)[balls]),
+        'Sixes per Innings': standardize((totals['batting_sixes'] / innings)[balls]),
+        'Dot Ball Percentage (Batsman)': standardize((totals['batting_dots'] / totals['batting_balls'] * 100)[balls], False),
+        'Boundary Frequency (Batsmen)': standardize(
+            ((totals['batting_fours'] + totals['batting_sixes']) / totals['batting_balls'])[balls]),
+    })
+
+
+def bowling_features(totals):
+    balls = totals['bowling_balls'] >= MIN_BALLS
+    took_wickets = balls & (totals['bowling_wickets'] > 0)
+    completed_overs = totals['bowling_balls'] // 6
+    overs = totals['bowling_overs']
+    return pd.DataFrame({
+        'Dot Ball Percentage (Bowlers)': standardize((totals['bowling_dots'] / totals['bowling_balls'] * 100)[balls]),
+        'Bowling Averages': standardize((totals['bowling_runs'] / totals['bowling_wickets'])[took_wickets], False),
+        'Balls per Wicket': standardize((totals['bowling_balls'] / totals['bowling_wickets'])[took_wickets], False),
+        'Wickets per Game': standardize((totals['bowling_dismissals'] / totals['bowling_games'])[balls]),
+        'Economy Rates': standardize((totals['bowling_runs'] / completed_overs)[balls], False),
+        'Sixes Conceded per Over': standardize((totals['bowling_sixes'] / completed_overs)[balls], False),
+        'Fours Conceded per Over': standardize((totals['bowling_fours'] / completed_overs)[balls], False),
+        # Matches played include the ones a bowler only batted in.
+        'Average Overs per Match': standardize((overs / totals['appearances'])[overs > MIN_OVERS]),
+        'Boundary Frequency (Bowlers)': standardize(
+            ((totals['bowling_fours'] + totals['bowling_sixes']) / totals['bowling_balls'])[balls], False),
+    })
+
+
+def features_from_totals(totals):
+    # One row per player with every standardized feature; a player without a
+    # value for a feature (too few balls, no centuries, ...) gets 0 for it.
+    extracted_features_df = pd.concat([batting_features(totals), bowling_features(totals)], axis=1)
+    return extracted_features_df.reindex(columns=FEATURE_COLUMNS).fillna(0)
+
+
+def extract_player_features(ball_by_ball_df, key='match_id'):
+    totals = player_match_totals(ball_by_ball_df, key).groupby(level='player').sum()
+    return features_from_totals(totals)
+
+
+def player_feature_matrix(extracted_features_df, players):
+    # Feature rows for the given players in order, zeros for players never seen.
+    return extracted_features_df.reindex(players, fill_value=0).to_numpy()
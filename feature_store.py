@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from feature_extraction import features_from_totals, player_match_totals
+
+
+class FeatureStore:
+    # Cumulative per-player totals over each player's matches in date order, so
+    # a player's career "as of" any date is the difference of two prefix-sum
+    # rows. Features for a match only ever see matches played before its date.
+
+    def __init__(self, ball_by_ball_df, matches_df, key='match_id'):
+        totals = player_match_totals(ball_by_ball_df, key).reset_index()
+        match_dates = pd.Series(pd.to_datetime(matches_df['Date']).to_numpy(), index=matches_df['ID'].to_numpy())
+        totals['date'] = totals['match'].map(match_dates)
+        totals = totals[totals['date'].notna()]
+
+        players, player_codes = np.unique(totals['player'].to_numpy(), return_inverse=True)
+        days = totals['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        order = np.lexsort((totals['match'].to_numpy(), days, player_codes))
+        self.columns = [column for column in totals.columns if column not in ('player', 'match', 'date')]
+        values = totals[self.columns].to_numpy(dtype=np.int64)[order]
+
+        # Rows sorted by (player, day) flatten into one searchable key.
+        self.day_span = int(days.max() - days.min()) + 2 if len(days) else 1
+        self.first_day = int(days.min()) if len(days) else 0
+        self.keys = player_codes[order] * self.day_span + (days[order] - self.first_day)
+        self.cumulative = np.vstack([np.zeros((1, len(self.columns)), dtype=np.int64), np.cumsum(values, axis=0)])
+        self.offsets = np.searchsorted(self.keys, np.arange(len(players) + 1) * self.day_span)
+        self.players = players
+        self.positions = {player: i for i, player in enumerate(players.tolist())}
+        self.match_dates = match_dates
+        self._features = {}
+
+    def __contains__(self, player):
+        return player in self.positions
+
+    def _day(self, date):
+        day = int(np.datetime64(pd.Timestamp(date), 'D').astype(np.int64)) - self.first_day
+        return min(max(day, 0), self.day_span - 1)
+
+    def totals_as_of(self, date, players=None):
+        # Summed player_match_totals over every match strictly before date.
+        codes = np.arange(len(self.players)) if players is None else np.array(
+            [self.positions.get(player, -1) for player in players], dtype=np.int64)
+        known = codes >= 0
+        codes = np.where(known, codes, 0)
+        ends = np.searchsorted(self.keys, codes * self.day_span + self._day(date), side='left')
+        totals = self.cumulative[ends] - self.cumulative[self.offsets[codes]]
+        totals[~known] = 0
+        index = self.players if players is None else list(players)
+        return pd.DataFrame(totals, index=pd.Index(index, dtype=object), columns=self.columns)
+
+    def features_as_of(self, date, players=None):
+        # Standardized over every player with history before date, exactly as
+        # extract_player_features would on the deliveries before it.
+        day = self._day(date)
+        if day not in self._features:
+            self._features[day] = features_from_totals(self.totals_as_of(date))
+        features = self._features[day]
+        return features if players is None else features.reindex(players, fill_value=0)
+
+    def match_features(self, match_id, players=None):
+        return self.features_as_of(self.match_dates[match_id], players)
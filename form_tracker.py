@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+
+FORM_WINDOWS = (5, 10, 20)
+
+
+class FormTracker:
+    # Each player's last max(windows) scores sit in one row of a ring buffer,
+    # with running sums and sums of squares per window. A match's update only
+    # touches the rows of the players who played in it.
+
+    def __init__(self, windows=FORM_WINDOWS, capacity=256):
+        self.windows = tuple(sorted(windows))
+        self.window_sizes = np.array(self.windows, dtype=np.int64)
+        self.buffer_size = self.windows[-1]
+        self.positions = {}
+        self.players = []
+        self.buffer = np.zeros((capacity, self.buffer_size))
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.sums = np.zeros((capacity, len(self.windows)))
+        self.sums_of_squares = np.zeros((capacity, len(self.windows)))
+
+    def _codes(self, players, add=False):
+        codes = np.empty(len(players), dtype=np.int64)
+        for i, player in enumerate(players):
+            code = self.positions.get(player)
+            if code is None:
+                if not add:
+                    codes[i] = -1
+                    continue
+                code = self.positions[player] = len(self.players)
+                self.players.append(player)
+            codes[i] = code
+        if len(self.players) > len(self.counts):
+            self._grow(len(self.players))
+        return codes
+
+    def _grow(self, size):
+        capacity = max(size, 2 * len(self.counts))
+        extra = capacity - len(self.counts)
+        self.buffer = np.vstack([self.buffer, np.zeros((extra, self.buffer_size))])
+        self.counts = np.append(self.counts, np.zeros(extra, dtype=np.int64))
+        self.sums = np.vstack([self.sums, np.zeros((extra, len(self.windows)))])
+        self.sums_of_squares = np.vstack([self.sums_of_squares, np.zeros((extra, len(self.windows)))])
+
+    def update(self, players, scores):
+        # One match: every player appears at most once.
+        codes = self._codes(players, add=True)
+        scores = np.asarray(scores, dtype=np.float64)
+        counts = self.counts[codes]
+        # The score each window drops, if it is already full.
+        leaving = self.buffer[codes[:, None], (counts[:, None] - self.window_sizes) % self.buffer_size]
+        leaving = np.where(counts[:, None] >= self.window_sizes, leaving, 0.0)
+        self.sums[codes] += scores[:, None] - leaving
+        self.sums_of_squares[codes] += np.square(scores)[:, None] - np.square(leaving)
+        self.buffer[codes, counts % self.buffer_size] = scores
+        self.counts[codes] = counts + 1
+
+    def form(self, players=None):
+        # avg/max/std over the last w scores for every window w, using as many
+        # scores as a player has when that is fewer than w. The std is the sample
+        # std (NaN for a single score), as pandas rolling std gives.
+        players = list(self.players) if players is None else list(players)
+        return pd.DataFrame(self._form(self._codes(players)), index=pd.Index(players, dtype=object))
+
+    def _form(self, codes):
+        known = codes >= 0
+        codes = np.where(known, codes, 0)
+        counts = np.where(known, self.counts[codes], 0)
+
+        form = {}
+        recent = self.buffer[codes[:, None], (counts[:, None] - 1 - np.arange(self.buffer_size)) % self.buffer_size]
+        for k, window in enumerate(self.windows):
+            n = np.minimum(counts, window).astype(np.float64)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = self.sums[codes, k] / n
+                variance = (self.sums_of_squares[codes, k] - n * np.square(mean)) / (n - 1)
+            in_window = np.arange(window) < n[:, None]
+            form[f'avg_last_{window}'] = np.where(n > 0, mean, np.nan)
+            form[f'max_last_{window}'] = np.where(n > 0, np.where(in_window, recent[:, :window], -np.inf).max(axis=1), np.nan)
+            form[f'std_last_{window}'] = np.where(n > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+        return form
+
+
+def add_form_features(scores_df, windows=FORM_WINDOWS, player_column='Player', score_column='fantasy_score',
+                      match_column='match_id', date_column='date'):
+    # Replays the score history one match at a time through a FormTracker and
+    # writes each row's form including that row's score, the values a rolling
+    # window over the player's own history gives. A player listed twice for the
+    # same match is replayed in two rounds.
+    scores_df = scores_df.sort_values([player_column, date_column], kind='stable')
+    rounds = scores_df.groupby([date_column, match_column, player_column], sort=False).cumcount()
+    replay = scores_df.assign(_round=rounds.to_numpy()).reset_index(drop=True).sort_values(
+        [date_column, match_column, '_round'], kind='stable')
+    keys = replay[[date_column, match_column, '_round']]
+    starts = np.flatnonzero(np.append(True, (keys.iloc[1:].to_numpy() != keys.iloc[:-1].to_numpy()).any(axis=1)))
+    bounds = np.append(starts, len(replay))
+
+    tracker = FormTracker(windows)
+    players = replay[player_column].tolist()
+    scores = replay[score_column].to_numpy(dtype=np.float64)
+    form = None
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        codes = tracker._codes(players[start:end], add=True)
+        tracker.update(players[start:end], scores[start:end])
+        match_form = tracker._form(codes)
+        if form is None:
+            form = {column: np.empty(len(replay)) for column in match_form}
+        for column, values in match_form.items():
+            form[column][start:end] = values
+
+    if form is None:
+        return scores_df
+    # replay holds scores_df's rows by position; put the form back in that order.
+    positions = replay.index.to_numpy()
+    for column, values in form.items():
+        column_values = np.empty(len(replay))
+        column_values[positions] = values
+        scores_df[column] = column_values
+    return scores_df
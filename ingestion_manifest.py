@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+
+
+def file_sha1(file_path, block_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionManifest:
+    # Per YAML file: path, size, mtime and content hash, and for every combined
+    # output the hash it was produced from plus its [start, stop) row range there.
+
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        self.files = {}
+        self.outputs = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as file:
+                manifest = json.load(file)
+            self.files = manifest.get('files', {})
+            self.outputs = manifest.get('outputs', {})
+
+    def refresh(self, yaml_dir, yaml_files):
+        for yaml_file in yaml_files:
+            yaml_file_path = os.path.join(yaml_dir, yaml_file)
+            stat = os.stat(yaml_file_path)
+            entry = self.files.setdefault(yaml_file, {'outputs': {}})
+            if entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime and 'sha1' in entry:
+                continue
+            entry['path'] = yaml_file_path
+            entry['size'] = stat.st_size
+            entry['mtime'] = stat.st_mtime
+            entry['sha1'] = file_sha1(yaml_file_path)
+
+    def bind_output(self, output, combined_path):
+        # Row ranges only describe the combined file they were recorded against.
+        if self.outputs.get(output) != combined_path or not os.path.exists(combined_path):
+            self.reset_output(output)
+        self.outputs[output] = combined_path
+
+    def reset_output(self, output):
+        for entry in self.files.values():
+            entry['outputs'].pop(output, None)
+
+    def needs_parse(self, yaml_file, output):
+        entry = self.files[yaml_file]
+        produced = entry['outputs'].get(output)
+        return produced is None or produced['sha1'] != entry['sha1']
+
+    def row_range(self, yaml_file, output):
+        entry = self.files.get(yaml_file)
+        if entry is None or output not in entry['outputs']:
+            return None
+        return tuple(entry['outputs'][output]['rows'])
+
+    def set_row_range(self, yaml_file, output, start, stop):
+        entry = self.files[yaml_file]
+        entry['outputs'][output] = {'sha1': entry['sha1'], 'rows': [start, stop]}
+
+    def total_rows(self, output):
+        stops = [entry['outputs'][output]['rows'][1] for entry in self.files.values() if output in entry['outputs']]
+        return max(stops, default=0)
+
+    def removed_files(self, yaml_files, output):
+        present = set(yaml_files)
+        return [yaml_file for yaml_file, entry in self.files.items()
+                if yaml_file not in present and output in entry['outputs']]
+
+    def forget(self, yaml_file, output):
+        entry = self.files[yaml_file]
+        entry['outputs'].pop(output, None)
+        if not entry['outputs']:
+            del self.files[yaml_file]
+
+    def save(self):
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump({'outputs': self.outputs, 'files': self.files}, file)
+        os.replace(temp_path, self.manifest_path)
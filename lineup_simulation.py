@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from team_optimizer import CAPTAIN_MULTIPLIER, VICE_CAPTAIN_MULTIPLIER
+
+
+class ScoreDistributions:
+    # Every player's historical fantasy scores in one flat array with per-player
+    # offsets, so a draw for any set of players is a single gather. Players with
+    # no history are drawn from the pooled scores of everyone, or score 0 when
+    # nobody has any history.
+
+    def __init__(self, player_scores_df, last_n=None):
+        # player_scores_df is the (player, match_id, date, fantasy_score) table from
+        # calculate_all_players_fantasy_scores, in match order within each player.
+        scores = player_scores_df[['player', 'fantasy_score']]
+        if last_n is not None:
+            scores = scores.groupby('player', sort=False).tail(last_n)
+        players, player_rows = np.unique(scores['player'].to_numpy(), return_inverse=True)
+        order = np.argsort(player_rows, kind='stable')
+        self.scores = scores['fantasy_score'].to_numpy(dtype=np.float64)[order]
+        counts = np.bincount(player_rows, minlength=len(players))
+        self.offsets = np.append(0, np.cumsum(counts))
+        self.positions = {player: i for i, player in enumerate(players.tolist())}
+
+    def __contains__(self, player):
+        return player in self.positions
+
+    def sample(self, players, n_simulations, rng=None):
+        # (n_simulations x players) scores, each drawn independently with
+        # replacement from that player's history.
+        rng = np.random.default_rng(rng)
+        if not len(self.scores):
+            # No history at all, so there is no pool to draw unknown players from.
+            return np.zeros((n_simulations, len(players)))
+        rows = np.array([self.positions.get(player, -1) for player in players], dtype=np.int64)
+        starts = np.where(rows >= 0, self.offsets[np.maximum(rows, 0)], 0)
+        lengths = np.where(rows >= 0, self.offsets[np.maximum(rows, 0) + 1] - starts, len(self.scores))
+        draws = (rng.random((n_simulations, len(players))) * lengths).astype(np.int64)
+        return self.scores[starts + draws]
+
+
+def lineup_matrix(lineups_df, players, captain_multiplier=CAPTAIN_MULTIPLIER,
+                  vice_captain_multiplier=VICE_CAPTAIN_MULTIPLIER):
+    # lineups_df stacks lineups as select_top_dream11_teams returns them: one row
+    # per picked player with 'lineup', 'player' and 'role'. The result holds each
+    # lineup's multiplier for every player, 0 where the player is not picked.
+    lineup_ids, lineup_rows = np.unique(lineups_df['lineup'].to_numpy(), return_inverse=True)
+    player_index = {player: i for i, player in enumerate(players)}
+    multipliers = lineups_df['role'].map({'Captain': captain_multiplier,
+                                         'Vice Captain': vice_captain_multiplier}).fillna(1.0)
+    weights = np.zeros((len(lineup_ids), len(players)))
+    weights[lineup_rows, lineups_df['player'].map(player_index).to_numpy()] = multipliers.to_numpy()
+    return lineup_ids, weights
+
+
+def simulate_lineups(distributions, lineups_df, field_df=None, n_simulations=100000, seed=None,
+                     chunk_size=25000, **multipliers):
+    # Expected points and spread of every candidate lineup, plus the chance it
+    # outscores the whole field of opponent lineups (ties share the win).
+    # Simulations run in chunks so memory stays flat however many are asked for.
+    players = pd.unique(lineups_df['player'])
+    if field_df is not None:
+        players = pd.unique(np.concatenate([players, field_df['player'].to_numpy()]))
+    lineup_ids, weights = lineup_matrix(lineups_df, players, **multipliers)
+    field_weights = None if field_df is None else lineup_matrix(field_df, players, **multipliers)[1]
+
+    rng = np.random.default_rng(seed)
+    points_sum = np.zeros(len(lineup_ids))
+    points_sum_squares = np.zeros(len(lineup_ids))
+    wins = np.zeros(len(lineup_ids))
+    for start in range(0, n_simulations, chunk_size):
+        samples = distributions.sample(players, min(chunk_size, n_simulations - start), rng)
+        lineup_points = samples @ weights.T
+        points_sum += lineup_points.sum(axis=0)
+        points_sum_squares += np.square(lineup_points).sum(axis=0)
+        if field_weights is not None:
+            field_points = samples @ field_weights.T
+            field_best = field_points.max(axis=1, keepdims=True)
+            tied = (field_points == field_best).sum(axis=1, keepdims=True)
+            wins += np.where(lineup_points > field_best, 1.0,
+                             np.where(lineup_points == field_best, 1.0 / (tied + 1), 0.0)).sum(axis=0)
+
+    expected_points = points_sum / n_simulations
+    variance = np.maximum(points_sum_squares / n_simulations - np.square(expected_points), 0.0)
+    results = pd.DataFrame({
+        'lineup': lineup_ids,
+        'expected_points': expected_points,
+        'std_points': np.sqrt(variance),
+    })
+    if field_weights is not None:
+        results['win_probability'] = wins / n_simulations
+    return results
@@ -0,0 +1,81 @@
+import numpy as np
+
+
+WEIGHTS_FILENAME = 'weights.npz'
+
+ACTIVATIONS = {
+    'relu': lambda x: np.maximum(x, 0.0),
+    'tanh': np.tanh,
+    'linear': lambda x: x,
+}
+
+
+def _sigmoid(x):
+    return np.exp(-np.logaddexp(0.0, -x))
+
+
+class NumpyLSTM:
+    # The forward pass of Sequential([LSTM(units, activation=...), Dense(1)]) in
+    # numpy, so a trained model can be served without importing keras. Keras
+    # packs the input, forget, cell and output gates along the kernels' last
+    # axis, with sigmoid as the recurrent activation.
+
+    def __init__(self, kernel, recurrent_kernel, bias, dense_kernel, dense_bias, activation='relu'):
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Unsupported LSTM activation: {activation}")
+        self.kernel = np.asarray(kernel, dtype=np.float64)
+        self.recurrent_kernel = np.asarray(recurrent_kernel, dtype=np.float64)
+        self.bias = np.asarray(bias, dtype=np.float64)
+        self.dense_kernel = np.asarray(dense_kernel, dtype=np.float64)
+        self.dense_bias = np.asarray(dense_bias, dtype=np.float64)
+        self.activation = activation
+        self.units = self.recurrent_kernel.shape[0]
+
+    @classmethod
+    def from_model(cls, model):
+        lstm, dense = model.layers[0], model.layers[-1]
+        config = lstm.get_config()
+        if config.get('recurrent_activation', 'sigmoid') != 'sigmoid':
+            raise ValueError(f"Unsupported recurrent activation: {config['recurrent_activation']}")
+        kernel, recurrent_kernel, bias = lstm.get_weights()
+        dense_kernel, dense_bias = dense.get_weights()
+        return cls(kernel, recurrent_kernel, bias, dense_kernel, dense_bias, config['activation'])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as weights:
+            return cls(weights['kernel'], weights['recurrent_kernel'], weights['bias'],
+                       weights['dense_kernel'], weights['dense_bias'], str(weights['activation']))
+
+    def save(self, path):
+        np.savez(path, kernel=self.kernel, recurrent_kernel=self.recurrent_kernel, bias=self.bias,
+                 dense_kernel=self.dense_kernel, dense_bias=self.dense_bias, activation=np.array(self.activation))
+
+    def predict_on_batch(self, sequences):
+        # sequences is (samples, timesteps, features), as model.predict takes it.
+        sequences = np.asarray(sequences, dtype=np.float64)
+        activation = ACTIVATIONS[self.activation]
+        units = self.units
+        # The input projection of every timestep in one matmul; only the
+        # recurrent part has to run step by step.
+        inputs = sequences @ self.kernel + self.bias
+        h = np.zeros((len(sequences), units))
+        c = np.zeros((len(sequences), units))
+        for t in range(sequences.shape[1]):
+            z = inputs[:, t] + h @ self.recurrent_kernel
+            i = _sigmoid(z[:, :units])
+            f = _sigmoid(z[:, units:2 * units])
+            g = activation(z[:, 2 * units:3 * units])
+            o = _sigmoid(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * activation(c)
+        return h @ self.dense_kernel + self.dense_bias
+
+    def predict(self, sequences, verbose=0):
+        return self.predict_on_batch(sequences)
+
+
+def max_abs_difference(model, runtime, sequences):
+    # How far the numpy forward pass is from keras on the same inputs.
+    expected = np.asarray(model.predict(sequences, verbose=0), dtype=np.float64)
+    return float(np.max(np.abs(expected - runtime.predict_on_batch(sequences)), initial=0.0))
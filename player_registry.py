@@ -0,0 +1,187 @@
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Franchise renames and spelling variants seen in the Cricsheet data.
+TEAM_ALIASES = {
+    'Delhi Daredevils': 'Delhi Capitals',
+    'Rising Pune Supergiant': 'Rising Pune Supergiants',
+    'Royal Challengers Bangalore': 'Royal Challengers Bengaluru'
+}
+
+ROLES = ['WK', 'BAT', 'AR', 'BWL']
+
+PLAYER_COLUMNS = ['batter', 'bowler', 'non-striker', 'player_out', 'fielders_involved']
+TEAM_COLUMNS = {
+    'matches': ['Team1', 'Team2', 'TossWinner', 'WinningTeam'],
+    'ball_by_ball': ['BattingTeam'],
+}
+
+MISSING = -1
+
+
+def read_player_roles(file_path):
+    # {name: role} from a roles CSV with 'name' and 'role' columns.
+    player_roles = {}
+    with open(file_path, 'r') as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            player_roles[row['name']] = row['role']
+    return player_roles
+
+
+class _Vocabulary:
+    def __init__(self, names=None, aliases=None):
+        self.names = list(names or [])
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.aliases = dict(aliases or {})
+
+    def canonical(self, name):
+        return self.aliases.get(name, name)
+
+    def add(self, name):
+        name = self.canonical(name)
+        if name not in self.ids:
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+        return self.ids[name]
+
+    def add_alias(self, alias, name):
+        self.aliases[alias] = name
+        return self.add(name)
+
+    def lookup(self, name):
+        return self.ids.get(self.canonical(name), MISSING)
+
+
+class PlayerRegistry:
+    # Dense, append-only integer ids for players and teams. An alias resolves to
+    # the id of its canonical name, so renamed franchises share one team id.
+
+    def __init__(self, players=None, player_aliases=None, teams=None, team_aliases=None, roles=None):
+        self.players = _Vocabulary(players, player_aliases)
+        self.teams = _Vocabulary(teams, TEAM_ALIASES if team_aliases is None else team_aliases)
+        self.roles = dict(roles or {})
+
+    @classmethod
+    def load(cls, registry_path):
+        if not os.path.exists(registry_path):
+            return cls()
+        with open(registry_path, 'r') as file:
+            registry = json.load(file)
+        return cls(registry['players'], registry['player_aliases'], registry['teams'], registry['team_aliases'],
+                   registry.get('roles'))
+
+    def save(self, registry_path):
+        temp_path = registry_path + '.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump({
+                'players': self.players.names,
+                'player_aliases': self.players.aliases,
+                'teams': self.teams.names,
+                'team_aliases': self.teams.aliases,
+                'roles': self.roles
+            }, file)
+        os.replace(temp_path, registry_path)
+
+    @property
+    def team_aliases(self):
+        return self.teams.aliases
+
+    def player_id(self, name):
+        return self.players.lookup(name)
+
+    def team_id(self, name):
+        return self.teams.lookup(name)
+
+    def player_name(self, player_id):
+        return self.players.names[player_id]
+
+    def team_name(self, team_id):
+        return self.teams.names[team_id]
+
+    def add_player_alias(self, alias, name):
+        return self.players.add_alias(alias, name)
+
+    def add_team_alias(self, alias, name):
+        return self.teams.add_alias(alias, name)
+
+    def set_roles(self, player_roles):
+        for name, role in player_roles.items():
+            self.roles[self.players.canonical(name)] = role
+
+    def role_codes(self):
+        # Role index into ROLES for every player id, MISSING where unknown.
+        role_index = {role: i for i, role in enumerate(ROLES)}
+        return np.array([role_index.get(self.roles.get(name), MISSING) for name in self.players.names],
+                        dtype=np.int8)
+
+    def register_matches(self, matches_df):
+        for column in TEAM_COLUMNS['matches']:
+            for team in pd.unique(matches_df[column].dropna()):
+                self.teams.add(team)
+        for column in ['Team1Players', 'Team2Players']:
+            for lineup in matches_df[column].dropna():
+                for player in (lineup.split(', ') if isinstance(lineup, str) else lineup):
+                    self.players.add(player)
+
+    def register_ball_by_ball(self, ball_by_ball_df):
+        for team in pd.unique(ball_by_ball_df['BattingTeam'].dropna()):
+            self.teams.add(team)
+        for column in PLAYER_COLUMNS:
+            if column not in ball_by_ball_df.columns:
+                continue
+            for player in pd.unique(ball_by_ball_df[column].dropna()):
+                # Joint run-out credits ("A, B") get an id of their own, so coded
+                # fielding keeps the points name-keyed scoring credits them with.
+                if player != 'NA':
+                    self.players.add(player)
+
+    def _encode(self, vocabulary, values):
+        categorical = values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype('category')
+        # Resolve each distinct name once, then gather through the category codes.
+        category_ids = np.array([vocabulary.lookup(name) for name in categorical.cat.categories] + [MISSING],
+                                dtype=np.int32)
+        return category_ids[categorical.cat.codes.to_numpy()]
+
+    def encode_players(self, values):
+        return self._encode(self.players, values)
+
+    def encode_teams(self, values):
+        return self._encode(self.teams, values)
+
+    def decode_players(self, player_ids):
+        names = np.array(self.players.names + [None], dtype=object)
+        return names[np.asarray(player_ids, dtype=np.int64)]
+
+    def decode_teams(self, team_ids):
+        names = np.array(self.teams.names + [None], dtype=object)
+        return names[np.asarray(team_ids, dtype=np.int64)]
+
+    def encode_lineup(self, lineup):
+        return np.array([self.players.lookup(player) for player in lineup], dtype=np.int32)
+
+    def encode_ball_by_ball(self, ball_by_ball_df):
+        ball_by_ball_df = ball_by_ball_df.copy()
+        for column in PLAYER_COLUMNS:
+            if column in ball_by_ball_df.columns:
+                ball_by_ball_df[column] = self.encode_players(ball_by_ball_df[column])
+        for column in TEAM_COLUMNS['ball_by_ball']:
+            if column in ball_by_ball_df.columns:
+                ball_by_ball_df[column] = self.encode_teams(ball_by_ball_df[column])
+        return ball_by_ball_df
+
+    def encode_matches(self, matches_df):
+        matches_df = matches_df.copy()
+        for column in TEAM_COLUMNS['matches']:
+            if column in matches_df.columns:
+                matches_df[column] = self.encode_teams(matches_df[column])
+        for column in ['Team1Players', 'Team2Players']:
+            if column in matches_df.columns:
+                matches_df[column] = matches_df[column].map(
+                    lambda lineup: self.encode_lineup(lineup.split(', ') if isinstance(lineup, str) else lineup))
+        return matches_df
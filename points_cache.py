@@ -0,0 +1,134 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+import pandas as pd
+
+from dataset_store import SCORING_COLUMNS, MatchIndex, select_match
+from fantasy_scoring import SCORING_RULES_VERSION, score_all_matches
+from scoring_rules import DREAM11_T20_RULES, rules_fingerprint
+
+
+CACHE_FILENAME = 'match_points.parquet'
+
+
+def rules_key(rules=DREAM11_T20_RULES):
+    return f'{SCORING_RULES_VERSION}-{rules_fingerprint(rules)}'
+
+
+def match_digests(ball_by_ball_df, rules_version=rules_key()):
+    # One digest per match over the columns scoring reads, salted with the rules version.
+    deliveries = ball_by_ball_df if isinstance(ball_by_ball_df, MatchIndex) else MatchIndex(ball_by_ball_df)
+    columns = [column for column in SCORING_COLUMNS if column in deliveries.df.columns]
+    row_hashes = pd.util.hash_pandas_object(deliveries.df[columns], index=False).to_numpy()
+
+    digests = {}
+    for match_id, i in deliveries.positions.items():
+        digest = hashlib.sha1(f'rules-{rules_version}:'.encode())
+        digest.update(row_hashes[deliveries.offsets[i]:deliveries.offsets[i + 1]].tobytes())
+        digests[match_id] = digest.hexdigest()
+    return digests
+
+
+class PointsCache:
+    # Per-match points tables keyed by (match_id, digest). The disk tier is one
+    # Parquet file sorted by match_id holding the latest table of every match;
+    # single-match lookups also go through an LRU of recently used tables.
+
+    def __init__(self, cache_dir, max_entries=1024, rules=DREAM11_T20_RULES):
+        self.path = os.path.join(cache_dir, CACHE_FILENAME)
+        self.max_entries = max_entries
+        self.rules = rules
+        self.rules_version = rules_key(rules)
+        self.memory = OrderedDict()
+        self.pending = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _remember(self, key, points):
+        self.memory[key] = points
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _read_disk(self, match_ids=None):
+        if not os.path.exists(self.path):
+            return None
+        filters = None if match_ids is None else [('match_id', 'in', list(match_ids))]
+        return pd.read_parquet(self.path, filters=filters)
+
+    def _write_disk(self, disk):
+        disk = disk.sort_values('match_id', kind='stable')
+        temp_path = self.path + '.tmp'
+        disk.to_parquet(temp_path, index=False, row_group_size=4096)
+        os.replace(temp_path, self.path)
+
+    def get(self, match_id, digest):
+        key = (match_id, digest)
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        if match_id in self.pending and self.pending[match_id][0] == digest:
+            return self.pending[match_id][1]
+        disk = self._read_disk([match_id])
+        if disk is None:
+            return None
+        disk = disk[disk['digest'] == digest]
+        if disk.empty:
+            return None
+        points = disk.drop(columns='digest').reset_index(drop=True)
+        self._remember(key, points)
+        return points
+
+    def put(self, match_id, digest, points):
+        self.pending[match_id] = (digest, points)
+        self._remember((match_id, digest), points)
+
+    def flush(self):
+        # Rewrites the disk tier once for everything put since the last flush; an
+        # older table of the same match (stale deliveries or rules) is replaced.
+        if not self.pending:
+            return
+        tables = [points.assign(digest=digest) for digest, points in self.pending.values()]
+        disk = self._read_disk()
+        if disk is not None:
+            tables.insert(0, disk[~disk['match_id'].isin(list(self.pending))])
+        self._write_disk(pd.concat(tables, ignore_index=True))
+        self.pending = {}
+
+    def all_matches_points(self, ball_by_ball_df):
+        # Same table as score_all_matches; only matches missing from the cache are scored.
+        deliveries = ball_by_ball_df if isinstance(ball_by_ball_df, MatchIndex) else MatchIndex(ball_by_ball_df)
+        digests = pd.Series(match_digests(deliveries, self.rules_version), dtype=object)
+        self.flush()
+
+        disk = self._read_disk()
+        if disk is None:
+            hits = disk = pd.DataFrame(columns=['match_id', 'digest'])
+        else:
+            hits = disk[disk['match_id'].map(digests).to_numpy() == disk['digest'].to_numpy()]
+        missing = digests.index[~digests.index.isin(hits['match_id'].unique())]
+
+        points = hits.drop(columns='digest')
+        if len(missing):
+            scored = score_all_matches(pd.concat([deliveries.match(match_id) for match_id in missing]), self.rules)
+            scored_digests = scored['match_id'].map(digests)
+            self._write_disk(pd.concat([
+                disk[~disk['match_id'].isin(missing)], scored.assign(digest=scored_digests)
+            ], ignore_index=True))
+            points = pd.concat([points, scored], ignore_index=True) if len(points) else scored
+            print(f"Scored {len(missing)} matches, {len(digests) - len(missing)} from cache")
+
+        points = points.sort_values(['match_id', 'total_points'], ascending=[True, False], kind='stable')
+        return points.reset_index(drop=True)
+
+    def match_points(self, ball_by_ball_df, match_id):
+        # Single-match lookups are held in pending until flush() writes them out.
+        match_balls = select_match(ball_by_ball_df, match_id)
+        digest = match_digests(match_balls, self.rules_version).get(match_id)
+        if digest is None:
+            return score_all_matches(match_balls, self.rules)
+        points = self.get(match_id, digest)
+        if points is None:
+            points = score_all_matches(match_balls, self.rules)
+            self.put(match_id, digest, points)
+        return points
@@ -0,0 +1,81 @@
+import numpy as np
+
+
+SCALERS_FILENAME = 'scalers.npz'
+
+
+class ScalerRegistry:
+    # Per-player min/max of fantasy_score in two arrays indexed by a player code,
+    # i.e. one MinMaxScaler per player. Transforms take a player per score (or
+    # per row of scores) and run as a single vectorized lookup.
+
+    def __init__(self, players=(), minimum=(), maximum=()):
+        self.players = list(players)
+        self.positions = {player: i for i, player in enumerate(self.players)}
+        self.min = np.array(minimum, dtype=np.float64)
+        self.max = np.array(maximum, dtype=np.float64)
+
+    @classmethod
+    def from_scores(cls, player_scores_df, player_column='player', score_column='fantasy_score'):
+        registry = cls()
+        registry.update(player_scores_df[player_column].to_numpy(), player_scores_df[score_column].to_numpy())
+        return registry
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as scalers:
+            return cls(scalers['players'].tolist(), scalers['min'], scalers['max'])
+
+    def save(self, path):
+        np.savez(path, players=np.array(self.players, dtype=str), min=self.min, max=self.max)
+
+    def copy(self):
+        return ScalerRegistry(self.players, self.min, self.max)
+
+    def __contains__(self, player):
+        return player in self.positions
+
+    def __len__(self):
+        return len(self.players)
+
+    def _codes(self, players, add=False):
+        codes = np.empty(len(players), dtype=np.int64)
+        for i, player in enumerate(players):
+            code = self.positions.get(player)
+            if code is None:
+                if not add:
+                    raise KeyError(f"No scaler for player {player}")
+                code = self.positions[player] = len(self.players)
+                self.players.append(player)
+            codes[i] = code
+        if len(self.players) > len(self.min):
+            extra = len(self.players) - len(self.min)
+            self.min = np.append(self.min, np.full(extra, np.inf))
+            self.max = np.append(self.max, np.full(extra, -np.inf))
+        return codes
+
+    def update(self, players, scores):
+        # New scores widen each player's range; unseen players are added. A
+        # player may appear any number of times in one update.
+        codes = self._codes(players, add=True)
+        scores = np.asarray(scores, dtype=np.float64)
+        np.minimum.at(self.min, codes, scores)
+        np.maximum.at(self.max, codes, scores)
+
+    def _bounds(self, players, scores):
+        codes = self._codes(players)
+        shape = (len(codes),) + (1,) * (np.ndim(scores) - 1)
+        minimum = self.min[codes].reshape(shape)
+        score_range = self.max[codes].reshape(shape) - minimum
+        # A constant series scales to 0, as MinMaxScaler treats a zero range as 1.
+        return minimum, np.where(score_range == 0, 1.0, score_range)
+
+    def transform(self, players, scores):
+        scores = np.asarray(scores, dtype=np.float64)
+        minimum, score_range = self._bounds(players, scores)
+        return (scores - minimum) / score_range
+
+    def inverse_transform(self, players, scaled):
+        scaled = np.asarray(scaled, dtype=np.float64)
+        minimum, score_range = self._bounds(players, scaled)
+        return scaled * score_range + minimum
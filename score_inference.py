@@ -0,0 +1,86 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from lstm_runtime import WEIGHTS_FILENAME, NumpyLSTM
+from scaler_registry import SCALERS_FILENAME, ScalerRegistry
+
+
+MODEL_NAME = 'player-score-lstm'
+MODEL_FILENAME = 'model.keras'
+METADATA_FILENAME = 'metadata.json'
+SEQUENCE_LENGTH = 18
+
+
+def _artifact_versions(artifacts_dir):
+    prefix = f'{MODEL_NAME}-v'
+    if not os.path.isdir(artifacts_dir):
+        return []
+    return sorted(int(name[len(prefix):]) for name in os.listdir(artifacts_dir)
+                  if name.startswith(prefix) and name[len(prefix):].isdigit())
+
+
+def latest_model_artifact(artifacts_dir):
+    versions = _artifact_versions(artifacts_dir)
+    if not versions:
+        return None
+    return os.path.join(artifacts_dir, f'{MODEL_NAME}-v{versions[-1]}')
+
+
+def read_metadata(artifact_path):
+    with open(os.path.join(artifact_path, METADATA_FILENAME)) as file:
+        metadata = json.load(file)
+    metadata['scalers'] = ScalerRegistry.load(os.path.join(artifact_path, SCALERS_FILENAME))
+    return metadata
+
+
+def load_runtime_artifact(artifact_path):
+    # The saved model as a NumpyLSTM, for scoring without keras.
+    return NumpyLSTM.load(os.path.join(artifact_path, WEIGHTS_FILENAME)), read_metadata(artifact_path)
+
+
+def player_windows(player_scores_df, players, sequence_length=SEQUENCE_LENGTH, before=None):
+    # Each player's last sequence_length scores (before the date, if given) as one
+    # row of a matrix, in the order players are listed. Shorter histories are
+    # left-padded with the player's earliest score so every row keeps the input
+    # range the model was trained on; players with no history are left out.
+    history_df = player_scores_df[player_scores_df['player'].isin(players)]
+    if before is not None:
+        history_df = history_df[history_df['date'] < pd.Timestamp(before)]
+    order = {player: i for i, player in enumerate(dict.fromkeys(players))}
+    history_df = history_df.assign(_order=history_df['player'].map(order).to_numpy()).sort_values(
+        ['_order', 'date'], kind='stable')
+    recent = history_df.groupby('_order', sort=False).tail(sequence_length)
+
+    codes, first_rows = np.unique(recent['_order'].to_numpy(), return_index=True)
+    counts = np.diff(np.append(first_rows, len(recent)))
+    scores = recent['fantasy_score'].to_numpy(dtype=np.float64)
+    windows = np.repeat(scores[first_rows, None], sequence_length, axis=1)
+    rows = np.repeat(np.arange(len(codes)), counts)
+    columns = np.arange(len(recent)) - np.repeat(first_rows, counts) + np.repeat(sequence_length - counts, counts)
+    windows[rows, columns] = scores
+    predicted_players = recent['player'].to_numpy()[first_rows].tolist()
+    return predicted_players, windows, counts, history_df
+
+
+def score_windows(model, players, windows, scalers):
+    # One forward pass over every player's window, scaled in and out per player.
+    predicted = np.asarray(model.predict_on_batch(scalers.transform(players, windows)[:, :, None]))
+    return scalers.inverse_transform(players, predicted[:, 0])
+
+
+def predict_player_scores(model, player_scores_df, players, scalers, sequence_length=SEQUENCE_LENGTH, before=None):
+    # Predicted next fantasy score per player with any history, one model call
+    # for the whole list. Players the model was not trained on are scaled by
+    # their own history before the date; the registry passed in is not changed.
+    predicted_players, windows, counts, history_df = player_windows(
+        player_scores_df, players, sequence_length, before)
+    if not predicted_players:
+        return pd.Series(dtype=np.float64)
+    unseen = history_df[~history_df['player'].isin(scalers.positions)]
+    if len(unseen):
+        scalers = scalers.copy()
+        scalers.update(unseen['player'].to_numpy(), unseen['fantasy_score'].to_numpy())
+    return pd.Series(score_windows(model, predicted_players, windows, scalers), index=predicted_players)
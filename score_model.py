@@ -0,0 +1,94 @@
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+from keras.callbacks import EarlyStopping
+from keras.layers import LSTM, Dense
+from keras.models import Sequential, load_model
+
+from lstm_runtime import WEIGHTS_FILENAME, NumpyLSTM, max_abs_difference
+from scaler_registry import SCALERS_FILENAME, ScalerRegistry
+from score_inference import MODEL_FILENAME, METADATA_FILENAME, MODEL_NAME, SEQUENCE_LENGTH, _artifact_versions, read_metadata
+from sequence_dataset import SequenceDataset
+
+
+# Largest difference from keras the numpy runtime may show on the validation windows.
+RUNTIME_TOLERANCE = 1e-4
+
+
+def build_model(sequence_length=SEQUENCE_LENGTH):
+    model = Sequential([
+        LSTM(50, activation='relu', input_shape=(sequence_length, 1)),
+        Dense(1)
+    ])
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
+
+
+def check_runtime(model, sequences):
+    # A model NumpyLSTM cannot reproduce is not saved, since serving would
+    # score it differently from keras.
+    runtime_error = max_abs_difference(model, NumpyLSTM.from_model(model), sequences)
+    print(f"NumPy runtime max abs difference from keras: {runtime_error:.2e}")
+    if runtime_error > RUNTIME_TOLERANCE:
+        raise ValueError(f"The NumPy runtime is {runtime_error:.2e} away from keras, more than {RUNTIME_TOLERANCE}")
+    return runtime_error
+
+
+def train_global_model(player_scores_df, cutoff, artifacts_dir, sequence_length=SEQUENCE_LENGTH, epochs=100,
+                       batch_size=32, patience=10):
+    # One model over every player's sequences from matches before cutoff. Scalers
+    # are fitted on the same rows, so nothing after the cutoff leaks in.
+    cutoff = pd.Timestamp(cutoff)
+    history_df = player_scores_df[player_scores_df['date'] < cutoff].sort_values(['player', 'date'], kind='stable')
+    scalers = ScalerRegistry.from_scores(history_df)
+    history_df = history_df.assign(fantasy_score=scalers.transform(history_df['player'].to_numpy(),
+                                                                   history_df['fantasy_score'].to_numpy()))
+
+    dataset = SequenceDataset(history_df, sequence_length, player_column='player')
+    train_set, val_set = dataset.split(0.1)
+    print(f"Training on {len(train_set)} sequences from {history_df['player'].nunique()} players before {cutoff.date()}")
+
+    model = build_model(sequence_length)
+    early_stopping = EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True)
+    history = model.fit(
+        train_set.batches(batch_size),
+        steps_per_epoch=train_set.steps(batch_size),
+        epochs=epochs,
+        validation_data=val_set.arrays(),
+        callbacks=[early_stopping]
+    )
+
+    runtime_error = check_runtime(model, val_set.arrays()[0])
+
+    metadata = {
+        'model': MODEL_NAME,
+        'cutoff': str(cutoff.date()),
+        'sequence_length': sequence_length,
+        'trained_at': datetime.now().isoformat(timespec='seconds'),
+        'train_sequences': len(train_set),
+        'val_loss': float(min(history.history['val_loss'])),
+        'runtime_max_abs_difference': runtime_error,
+    }
+    return save_model_artifact(model, scalers, metadata, artifacts_dir), history
+
+
+def save_model_artifact(model, scalers, metadata, artifacts_dir):
+    # Every save is a new numbered directory; earlier models stay loadable.
+    versions = _artifact_versions(artifacts_dir)
+    version = versions[-1] + 1 if versions else 1
+    artifact_path = os.path.join(artifacts_dir, f'{MODEL_NAME}-v{version}')
+    os.makedirs(artifact_path)
+    model.save(os.path.join(artifact_path, MODEL_FILENAME))
+    # The same weights for NumpyLSTM, so serving does not need keras.
+    NumpyLSTM.from_model(model).save(os.path.join(artifact_path, WEIGHTS_FILENAME))
+    scalers.save(os.path.join(artifact_path, SCALERS_FILENAME))
+    with open(os.path.join(artifact_path, METADATA_FILENAME), 'w') as file:
+        json.dump(dict(metadata, version=version), file, indent=2)
+    print(f"Saved {MODEL_NAME} v{version} to {artifact_path}")
+    return artifact_path
+
+
+def load_model_artifact(artifact_path):
+    return load_model(os.path.join(artifact_path, MODEL_FILENAME)), read_metadata(artifact_path)
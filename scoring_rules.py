@@ -0,0 +1,103 @@
+import hashlib
+import json
+
+import numpy as np
+
+
+# A rule set is plain data. Band lists are checked in order and the first band
+# whose bounds contain the value wins; a value outside every band scores 0.
+# Bounds: 'min' (>=), 'above' (>), 'max' (<=), 'below' (<); a missing side is open.
+DREAM11_T20_RULES = {
+    'name': 'dream11-t20',
+    'starting_xi': 4,
+    'batting': {
+        'run': 1,
+        'four_bonus': 1,
+        'six_bonus': 2,
+        'duck': -2,
+        'milestones': [
+            {'min': 100, 'points': 16},
+            {'min': 50, 'points': 8},
+            {'min': 30, 'points': 4},
+        ],
+        'strike_rate_min_balls': 10,
+        'strike_rate': [
+            {'min': 170, 'points': 6},
+            {'min': 150, 'below': 170, 'points': 4},
+            {'min': 130, 'below': 150, 'points': 2},
+            {'below': 50, 'points': -6},
+            {'min': 50, 'below': 60, 'points': -4},
+            {'min': 60, 'below': 70, 'points': -2},
+        ],
+    },
+    'bowling': {
+        'wicket_kinds': ['caught', 'bowled', 'lbw', 'stumped', 'caught and bowled', 'hit wicket'],
+        # Bowlers without a wicket earn no bowling points at all, economy and maidens included.
+        'requires_wicket': True,
+        'wicket': 25,
+        'lbw_bowled_bonus': 8,
+        'hauls': [
+            {'min': 5, 'points': 16},
+            {'min': 4, 'max': 4, 'points': 8},
+            {'min': 3, 'max': 3, 'points': 4},
+        ],
+        'maiden': 12,
+        'economy_min_overs': 2,
+        'economy_rate': [
+            {'below': 5, 'points': 6},
+            {'min': 5, 'max': 5.99, 'points': 4},
+            {'min': 6, 'max': 7, 'points': 2},
+            {'min': 10, 'max': 11, 'points': -2},
+            {'min': 11.01, 'max': 12, 'points': -4},
+            {'above': 12, 'points': -6},
+        ],
+    },
+    'fielding': {
+        'catch': 8,
+        'catch_bonuses': [
+            {'min': 3, 'points': 4},
+        ],
+        'stumping': 12,
+        'run_out': 12,
+    },
+}
+
+
+def compile_bands(bands):
+    # Each band becomes one column of the threshold arrays band_points compares against.
+    lower = np.array([band.get('min', band.get('above', -np.inf)) for band in bands], dtype=np.float64)
+    lower_inclusive = np.array(['above' not in band for band in bands])
+    upper = np.array([band.get('max', band.get('below', np.inf)) for band in bands], dtype=np.float64)
+    upper_inclusive = np.array(['below' not in band for band in bands])
+    points = np.array([band['points'] for band in bands] + [0], dtype=np.int64)
+    return lower, lower_inclusive, upper, upper_inclusive, points
+
+
+def band_points(compiled_bands, values):
+    lower, lower_inclusive, upper, upper_inclusive, points = compiled_bands
+    values = np.asarray(values, dtype=np.float64)[..., None]
+    inside = (
+        np.where(lower_inclusive, values >= lower, values > lower)
+        & np.where(upper_inclusive, values <= upper, values < upper)
+    )
+    # First matching band, or the trailing 0 when none matches.
+    first = np.where(inside.any(axis=-1), inside.argmax(axis=-1), len(lower))
+    return points[first]
+
+
+def compile_rules(rules):
+    batting, bowling, fielding = rules['batting'], rules['bowling'], rules['fielding']
+    return {
+        'compiled': True,
+        'name': rules.get('name', 'rules'),
+        'starting_xi': rules['starting_xi'],
+        'batting': dict(batting, milestones=compile_bands(batting['milestones']),
+                        strike_rate=compile_bands(batting['strike_rate'])),
+        'bowling': dict(bowling, hauls=compile_bands(bowling['hauls']),
+                        economy_rate=compile_bands(bowling['economy_rate'])),
+        'fielding': dict(fielding, catch_bonuses=compile_bands(fielding['catch_bonuses'])),
+    }
+
+
+def rules_fingerprint(rules):
+    return hashlib.sha1(json.dumps(rules, sort_keys=True).encode()).hexdigest()
@@ -0,0 +1,61 @@
+import math
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class SequenceDataset:
+    # Every player's scores laid end to end in one array; a sample is the start
+    # of a window inside one player's run, the target the score right after it.
+    # Windows are strided views over that array, so nothing is copied until a
+    # batch is taken. Samples keep create_sequences' order: players by first
+    # appearance, then their rows in data order.
+
+    def __init__(self, data, sequence_length, player_column='Player', score_column='fantasy_score',
+                 scores=None, starts=None):
+        self.sequence_length = sequence_length
+        if scores is None:
+            # factorize numbers players by first appearance.
+            player_codes = pd.factorize(data[player_column])[0]
+            rows = np.argsort(player_codes, kind='stable')
+            scores = data[score_column].to_numpy(dtype=np.float64)[rows]
+            counts = np.bincount(player_codes)
+            offsets = np.append(0, np.cumsum(counts))
+            starts = np.concatenate([np.arange(offset, offset + count - sequence_length)
+                                     for offset, count in zip(offsets[:-1], counts) if count > sequence_length]
+                                    or [np.zeros(0, dtype=np.int64)]).astype(np.int64)
+        self.scores = scores
+        self.starts = starts
+        self.windows = sliding_window_view(scores, sequence_length) if len(scores) >= sequence_length else \
+            np.zeros((0, sequence_length))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def subset(self, start, stop):
+        return SequenceDataset(None, self.sequence_length, scores=self.scores, starts=self.starts[start:stop])
+
+    def split(self, test_size):
+        # Ordered split, sized as train_test_split(..., shuffle=False) sizes it.
+        n_test = math.ceil(test_size * len(self))
+        return self.subset(0, len(self) - n_test), self.subset(len(self) - n_test, len(self))
+
+    def batch(self, indices):
+        starts = self.starts[indices]
+        return self.windows[starts][:, :, None], self.scores[starts + self.sequence_length]
+
+    def arrays(self):
+        return self.batch(np.arange(len(self)))
+
+    def steps(self, batch_size):
+        return math.ceil(len(self) / batch_size)
+
+    def batches(self, batch_size=32, shuffle=True, seed=None):
+        # Endless (X, y) batches for model.fit(..., steps_per_epoch=steps(batch_size)),
+        # reshuffled every epoch.
+        rng = np.random.default_rng(seed)
+        while True:
+            order = rng.permutation(len(self)) if shuffle else np.arange(len(self))
+            for start in range(0, len(self), batch_size):
+                yield self.batch(order[start:start + batch_size])
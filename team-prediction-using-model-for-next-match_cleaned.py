@@ -1,136 +1,113 @@
-import os
 import pandas as pd
-import numpy as np
-from sklearn.preprocessing import MinMaxScaler
-from keras.models import Sequential
-from keras.layers import LSTM, Dense
-from keras.callbacks import EarlyStopping
 import matplotlib.pyplot as plt
-from sklearn.model_selection import train_test_split
-
-
-def load_and_preprocess_data(directory, players_list):
-    all_data = pd.DataFrame()
-    for filename in os.listdir(directory):
-        player_name = filename[:-4]
-        if player_name in players_list:
-            df = pd.read_csv(os.path.join(directory, filename))
-            df['date'] = pd.to_datetime(df['date'], format='%d/%m/%y')
-            df['Player'] = player_name
-            all_data = pd.concat([all_data, df], ignore_index=True)
-
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    all_data['fantasy_score'] = all_data.groupby('Player')['fantasy_score'].transform(
-        lambda x: scaler.fit_transform(x.values.reshape(-1, 1)).flatten()
-    )
-
-    window_size = 5
-    all_data.sort_values(['Player', 'date'], inplace=True)
-    all_data['avg_last_5'] = all_data.groupby('Player')['fantasy_score'].rolling(
-        window=window_size, min_periods=1).mean().reset_index(0, drop=True)
-    all_data['max_last_5'] = all_data.groupby('Player')['fantasy_score'].rolling(
-        window=window_size, min_periods=1).max().reset_index(0, drop=True)
-    all_data['std_last_5'] = all_data.groupby('Player')['fantasy_score'].rolling(
-        window=window_size, min_periods=1).std().reset_index(0, drop=True)
-
-    return all_data
+from dataset_store import load_player_scores
+from form_tracker import add_form_features
+from sequence_dataset import SequenceDataset
+from scaler_registry import ScalerRegistry
+from score_inference import MODEL_NAME, latest_model_artifact, load_runtime_artifact, predict_player_scores
 
 
-def create_sequences(data, sequence_length):
-    X, y = [], []
-    players = data['Player'].unique()
-    for player in players:
-        player_data = data[data['Player'] == player]
-        scores = player_data['fantasy_score'].values
-        for i in range(len(scores) - sequence_length):
-            X.append(scores[i:(i + sequence_length)])
-            y.append(scores[i + sequence_length])
+def preprocess_data(player_scores_df, scalers):
+    all_data = player_scores_df.rename(columns={'player': 'Player'})
 
-    return np.array(X), np.array(y)
+    all_data['fantasy_score'] = scalers.transform(all_data['Player'].to_numpy(), all_data['fantasy_score'].to_numpy())
 
+    # avg_last_5, max_last_5 and std_last_5 from one replay through a FormTracker.
+    all_data = add_form_features(all_data, windows=(5,))
 
-def prepare_player_sequences(data, sequence_length, player_name):
-    player_data = data[data['Player'] == player_name]
-    if len(player_data) < sequence_length:
-        raise ValueError(
-            f"Not enough data to create a sequence for {player_name}. Need at least {sequence_length} games.")
-    sequence = player_data.iloc[-sequence_length:]['fantasy_score'].values.reshape(
-        1, sequence_length, 1)
-    return sequence
+    return all_data
 
 
 players_list = ['Ishan Kishan', 'RG Sharma', 'Naman Dhir', 'SA Yadav', 'Tilak Varma', 'HH Pandya', 'TH David', 'PP Chawla', 'JJ Bumrah', 'N Thushara', 'N Wadhera',
                 'SZ Mulani', 'PD Salt', 'SP Narine', 'A Raghuvanshi', 'SS Iyer', 'VR Iyer', 'RK Singh', 'AD Russell', 'Ramandeep Singh', 'MA Starc', 'CV Varun', 'Harshit Rana', 'VG Arora']
-directory = '/Users/hemantg/Desktop/fantasy-score-data-6may'
+player_scores_path = '/Users/hemantg/Desktop/fantasy-score-data-6may/player_fantasy_scores.parquet'
 
-data = load_and_preprocess_data(directory, players_list)
+# player_scores_path may also be a directory of older per-player CSVs.
+player_scores_df = load_player_scores(player_scores_path, players_list)
+artifacts_dir = '/Users/hemantg/Desktop/next-match-models'
 sequence_length = 18
-X, y = create_sequences(data, sequence_length)
-
-X_train_val, X_test, y_train_val, y_test = train_test_split(
-    X, y, test_size=0.15, random_state=42, shuffle=False)
-X_train, X_val, y_train, y_val = train_test_split(
-    X_train_val, y_train_val, test_size=0.18, random_state=42, shuffle=False)
-
-X_train = X_train.reshape((X_train.shape[0], X_train.shape[1], 1))
-X_val = X_val.reshape((X_val.shape[0], X_val.shape[1], 1))
-X_test = X_test.reshape((X_test.shape[0], X_test.shape[1], 1))
-
-model = Sequential([
-    LSTM(50, activation='relu', input_shape=(X_train.shape[1], 1)),
-    Dense(1)
-])
-model.compile(optimizer='adam', loss='mean_squared_error')
-
-early_stopping = EarlyStopping(
-    monitor='val_loss', patience=10, restore_best_weights=True)
-
-history = model.fit(
-    X_train, y_train,
-    epochs=100,
-    batch_size=32,
-    validation_split=0.1,
-    callbacks=[early_stopping]
-)
-
-test_loss = model.evaluate(X_test, y_test)
-print('Test Loss:', test_loss)
-
-plt.figure(figsize=(10, 5))
-plt.plot(history.history['loss'], label='Train Loss')
-plt.plot(history.history['val_loss'], label='Validation Loss')
-plt.title('Model Training History')
-plt.xlabel('Epoch')
-plt.ylabel('Loss')
-plt.legend()
-plt.show()
-
-test_loss = model.evaluate(X_test, y_test)
-print('Final Test Loss:', test_loss)
-
-predictions = model.predict(X_test)
-plt.figure(figsize=(10, 5))
-plt.plot(predictions, label='Predicted Fantasy Scores')
-plt.plot(y_test, label='Actual Fantasy Scores')
-plt.title('Comparison of Predictions and Actual Scores')
-plt.xlabel('Test Sample')
-plt.ylabel('Fantasy Score')
-plt.legend()
-plt.show()
-
-scalers = {player: MinMaxScaler() for player in players_list}
-for player in players_list:
-    player_scores = data[data['Player'] ==
-                         player]['fantasy_score'].values.reshape(-1, 1)
-    scalers[player].fit(player_scores)
 
+# keras is only imported to train; saved models are scored by the NumPy runtime.
+if input("Train a new model? (y/n): ").strip().lower() == 'y':
+    from datetime import datetime
+    from keras.callbacks import EarlyStopping
+    from score_model import build_model, check_runtime, save_model_artifact
+
+    # Per-player min/max, fitted once and reused to map predictions back to points.
+    scalers = ScalerRegistry.from_scores(player_scores_df)
+    data = preprocess_data(player_scores_df, scalers)
+    # Windows are strided views over each player's scores; batches are copied out lazily.
+    dataset = SequenceDataset(data, sequence_length)
+
+    train_val_set, test_set = dataset.split(0.15)
+    train_set, val_set = train_val_set.split(0.18)
+    # The last tenth of the training windows validates, as validation_split=0.1 did.
+    fit_set, fit_val_set = train_set.split(0.1)
+    X_test, y_test = test_set.arrays()
+
+    model = build_model(sequence_length)
+
+    early_stopping = EarlyStopping(
+        monitor='val_loss', patience=10, restore_best_weights=True)
+
+    history = model.fit(
+        fit_set.batches(32),
+        steps_per_epoch=fit_set.steps(32),
+        epochs=100,
+        validation_data=fit_val_set.arrays(),
+        callbacks=[early_stopping]
+    )
+
+    test_loss = model.evaluate(X_test, y_test)
+    print('Test Loss:', test_loss)
+
+    plt.figure(figsize=(10, 5))
+    plt.plot(history.history['loss'], label='Train Loss')
+    plt.plot(history.history['val_loss'], label='Validation Loss')
+    plt.title('Model Training History')
+    plt.xlabel('Epoch')
+    plt.ylabel('Loss')
+    plt.legend()
+    plt.show()
+
+    test_loss = model.evaluate(X_test, y_test)
+    print('Final Test Loss:', test_loss)
+
+    predictions = model.predict(X_test)
+    plt.figure(figsize=(10, 5))
+    plt.plot(predictions, label='Predicted Fantasy Scores')
+    plt.plot(y_test, label='Actual Fantasy Scores')
+    plt.title('Comparison of Predictions and Actual Scores')
+    plt.xlabel('Test Sample')
+    plt.ylabel('Fantasy Score')
+    plt.legend()
+    plt.show()
+
+    # Raises, and nothing is saved, if NumpyLSTM does not reproduce keras.
+    runtime_error = check_runtime(model, fit_val_set.arrays()[0])
+    metadata = {
+        'model': MODEL_NAME,
+        'cutoff': str((player_scores_df['date'].max() + pd.Timedelta(days=1)).date()),
+        'sequence_length': sequence_length,
+        'trained_at': datetime.now().isoformat(timespec='seconds'),
+        'train_sequences': len(fit_set),
+        'val_loss': float(min(history.history['val_loss'])),
+        'test_loss': float(test_loss),
+        'runtime_max_abs_difference': runtime_error,
+    }
+    artifact_path = save_model_artifact(model, scalers, metadata, artifacts_dir)
+else:
+    artifact_path = input("Enter the model artifact path (blank for the latest): ").strip() or latest_model_artifact(artifacts_dir)
+    if artifact_path is None:
+        raise SystemExit(f"No saved model found in {artifacts_dir}")
+model, metadata = load_runtime_artifact(artifact_path)
+print(f"Using {metadata['model']} v{metadata['version']} trained on matches before {metadata['cutoff']}")
+
+# Every player is scored in one model call; short histories are left-padded.
+predicted_scores = predict_player_scores(model, player_scores_df, players_list, metadata['scalers'],
+                                         metadata['sequence_length'])
 for player in players_list:
-    try:
-        player_sequence = prepare_player_sequences(
-            data, sequence_length, player)
-        predicted_score_normalized = model.predict(player_sequence)
-        predicted_score = scalers[player].inverse_transform(
-            predicted_score_normalized)
-        print(f"Predicted Fantasy Score for {player}: {predicted_score[0][0]}")
-    except ValueError as e:
-        print(e)
+    if player in predicted_scores.index:
+        print(f"Predicted Fantasy Score for {player}: {predicted_scores[player]}")
+    else:
+        print(f"No data available for player {player}.")